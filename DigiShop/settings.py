@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres',
 
     # Third Party Apps
     'tailwind',
@@ -156,6 +157,7 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'orders.context_processors.cart',
                 'products.context_processors.menu_categories',
+                'products.context_processors.wishlist',
             ],
         },
     },
@@ -179,6 +181,17 @@ DATABASES = {
 }
 
 
+# کش مشترک بین همه پروسه‌ها (Redis)
+# نسخه کش‌ها، بافر شمارنده‌ها و اسنپ‌شات‌ها باید بین workerها و دستورهای cron یکی باشند؛
+# کش پیش‌فرض جنگو (LocMem) مخصوص هر پروسه است و برای این کار مناسب نیست (core.E001).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -5,11 +5,14 @@ from django.core.cache import cache
 from django.contrib import messages
 
 from products.models import Review
+from products.wishlist import get_wishlist_ids
+from products.counters import with_pending
 from .utils import send_otp_sms
 import random
 from .models import Address
 from .forms import AddressForm, UserEditForm  # ✅ اضافه شدن فرم جدید
 from orders.models import Order
+from orders.cart import merge_session_cart
 
 User = get_user_model()
 
@@ -45,6 +48,8 @@ def verify_otp_view(request):
         if cached_code and str(cached_code) == code:
             user, created = User.objects.get_or_create(phone_number=mobile)
             login(request, user)
+            # سبد خرید مهمان به سبد ذخیره‌شده کاربر اضافه می‌شود
+            merge_session_cart(request)
 
             del request.session['auth_mobile']
             cache.delete(f'otp_{mobile}')
@@ -87,7 +92,7 @@ def dashboard_summary(request):
         'recent_orders': orders[:5],
         'processing_count': orders.filter(status='processing').count(),
         'delivered_count': orders.filter(status='delivered').count(),
-        'favorites_count': request.user.wishlist.count(),
+        'favorites_count': len(get_wishlist_ids(request.user)),
     }
 
     # ✅ اگر درخواست HTMX بود (کلیک روی سایدبار)
@@ -189,7 +194,7 @@ def wishlist_view(request):
 
 @login_required
 def user_reviews(request):
-    reviews = Review.objects.filter(user=request.user)
+    reviews = with_pending(Review.objects.filter(user=request.user), *Review.COUNTER_FIELDS)
     return render(request, 'accounts/dashboard/user_reviews.html', {'reviews': reviews})
 
 
@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'تنظیمات عمومی'
+
+    def ready(self):
+        import core.checks
+        import core.signals
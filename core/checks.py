@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+from .utils import is_shared_cache
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    نسخه کش‌ها (ایندکس پیشنهاد جستجو، درخت دسته‌ها، منو) و بافر شمارنده‌ها
+    فقط با کش مشترک بین پروسه‌ها درست کار می‌کنند.
+    """
+    if is_shared_cache():
+        return []
+    message = 'کش پیش‌فرض مخصوص هر پروسه است؛ تغییرات در workerهای دیگر دیده نمی‌شود.'
+    hint = 'CACHES را روی یک کش مشترک مثل Redis تنظیم کنید.'
+    if settings.DEBUG:
+        # سرور توسعه تک‌پروسه‌ای است
+        return [Warning(message, hint=hint, id='core.W001')]
+    return [Error(message, hint=hint, id='core.E001')]
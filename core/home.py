@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from core.models import HomeBanner, Slider
+from core.utils import get_cache_version
+from products.models import Product
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION_NAME = 'home_snapshot'
+SNAPSHOT_KEY = 'home_snapshot'
+REFRESH_LOCK_KEY = 'home_snapshot:refreshing'
+# بعد از این مدت (ثانیه) اسنپ‌شات در پس‌زمینه بازسازی می‌شود؛ تا آن موقع نسخه قبلی سرو می‌شود
+SNAPSHOT_TTL = getattr(settings, 'HOME_SNAPSHOT_TTL', 5 * 60)
+# بازسازی در ترد جداگانه؛ با False همان درخواست بازسازی را انجام می‌دهد
+BACKGROUND_REFRESH = getattr(settings, 'HOME_SNAPSHOT_BACKGROUND_REFRESH', True)
+
+# تعداد بنرهای هر جایگاه صفحه اصلی
+BANNER_SLOTS = {
+    HomeBanner.Position.TOP_LEFT: 2,
+    HomeBanner.Position.MID_TWO: 2,
+    HomeBanner.Position.BOTTOM_FOUR: 4,
+}
+
+
+def build_snapshot():
+    """داده‌های صفحه اصلی (اسلایدرها، بنرها، شگفت‌انگیزها و جدیدترین‌ها)"""
+    banners = {position: [] for position in BANNER_SLOTS}
+    for banner in HomeBanner.objects.filter(is_active=True, position__in=list(BANNER_SLOTS)).order_by('order'):
+        if len(banners[banner.position]) < BANNER_SLOTS[banner.position]:
+            banners[banner.position].append(banner)
+
+    amazing_products = Product.objects.filter(
+        status=Product.Status.PUBLISHED,
+        is_available=True,
+        stock__gt=0,
+        is_special=True,
+        discount_price__isnull=False
+    ).exclude(discount_price=0).order_by('-updated_at')[:10]
+
+    latest_products = Product.objects.filter(
+        status=Product.Status.PUBLISHED,
+        is_available=True
+    ).order_by('-created_at')[:12]
+
+    return {
+        'sliders': list(Slider.objects.filter(is_active=True)),
+        'banners': banners,
+        'amazing_products': list(amazing_products),
+        'latest_products': list(latest_products),
+    }
+
+
+def _store(version):
+    data = build_snapshot()
+    cache.set(SNAPSHOT_KEY, {'data': data, 'version': version, 'built_at': time.time()}, None)
+    return data
+
+
+def _refresh_in_background(version):
+    try:
+        _store(version)
+    except Exception:
+        # اسنپ‌شات قبلی سرو می‌شود و درخواست‌های بعدی دوباره تلاش می‌کنند
+        logger.exception('Home snapshot refresh failed')
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+        # اتصال دیتابیس مخصوص این ترد
+        connection.close()
+
+
+def get_home_snapshot():
+    """
+    داده‌های صفحه اصلی با الگوی stale-while-revalidate
+    فقط وقتی هیچ اسنپ‌شاتی در کش نیست درخواست منتظر دیتابیس می‌ماند؛
+    اسنپ‌شات منقضی یا قدیمی (تغییر اسلایدر، بنر یا محصول) همان لحظه سرو می‌شود
+    و یک ترد (با قفل کش، فقط یکی در هر زمان) آن را بازسازی می‌کند.
+    """
+    version = get_cache_version(CACHE_VERSION_NAME)
+    entry = cache.get(SNAPSHOT_KEY)
+    if entry is None:
+        return _store(version)
+
+    is_stale = entry['version'] != version or time.time() - entry['built_at'] >= SNAPSHOT_TTL
+    if is_stale and cache.add(REFRESH_LOCK_KEY, 1, 60):
+        if BACKGROUND_REFRESH:
+            threading.Thread(target=_refresh_in_background, args=(version,), daemon=True).start()
+        else:
+            try:
+                return _store(version)
+            finally:
+                cache.delete(REFRESH_LOCK_KEY)
+    return entry['data']
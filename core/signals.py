@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import HomeBanner, Slider
+from core.utils import bump_cache_version
+from core.home import CACHE_VERSION_NAME as HOME_SNAPSHOT_CACHE_VERSION
+from products.models import Product, products_updated
+
+
+@receiver([post_save, post_delete], sender=Slider)
+@receiver([post_save, post_delete], sender=HomeBanner)
+@receiver([post_save, post_delete], sender=Product)
+@receiver(products_updated, sender=Product)
+def invalidate_home_snapshot(sender, **kwargs):
+    # اسنپ‌شات فعلی تا پایان بازسازی پس‌زمینه همچنان سرو می‌شود
+    bump_cache_version(HOME_SNAPSHOT_CACHE_VERSION)
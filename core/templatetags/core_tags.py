@@ -1,4 +1,5 @@
 from django import template
+from products.cards import render_product_cards
 
 register = template.Library()
 
@@ -9,4 +10,12 @@ def get_list(dictionary, key):
     استفاده: request.GET|get_list:'spec_ram'
     """
     full_key = f"spec_{key}"
-    return dictionary.getlist(full_key)
\ No newline at end of file
+    return dictionary.getlist(full_key)
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products, variant):
+    """
+    کارت‌های محصول از کش مشترک (products.cards)
+    استفاده: {% product_cards page.object_list 'grid' %}
+    """
+    return render_product_cards(products, variant, context.get('request'))
@@ -1,3 +1,51 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from . import home
+from .models import Slider
+
+
+def create_slider(title):
+    return Slider.objects.create(title=title, image='sliders/test.jpg', url='https://example.com/')
+
+
+class HomeSnapshotTests(TestCase):
+    def setUp(self):
+        cache.delete(home.SNAPSHOT_KEY)
+        cache.delete(home.REFRESH_LOCK_KEY)
+
+    def slider_titles(self, snapshot):
+        return [slider.title for slider in snapshot['sliders']]
+
+    def test_first_request_builds_snapshot(self):
+        create_slider('اول')
+        self.assertEqual(self.slider_titles(home.get_home_snapshot()), ['اول'])
+
+    @mock.patch.object(home, 'BACKGROUND_REFRESH', True)
+    def test_changed_content_serves_stale_snapshot_and_refreshes_in_background(self):
+        home.get_home_snapshot()
+        create_slider('جدید')
+
+        with mock.patch.object(home.threading, 'Thread') as thread:
+            snapshot = home.get_home_snapshot()
+            # تا پایان بازسازی، نسخه قبلی سرو می‌شود و فقط یک بازسازی شروع می‌شود
+            self.assertEqual(self.slider_titles(snapshot), [])
+            home.get_home_snapshot()
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+        # اجرای همان کار ترد پس‌زمینه
+        home._store(thread.call_args.kwargs['args'][0])
+        self.assertEqual(self.slider_titles(home.get_home_snapshot()), ['جدید'])
+
+    @mock.patch.object(home, 'BACKGROUND_REFRESH', False)
+    def test_expired_snapshot_is_rebuilt(self):
+        home.get_home_snapshot()
+        # bulk_create سیگنال ندارد و نسخه عوض نمی‌شود؛ فقط انقضای TTL بازسازی را شروع می‌کند
+        Slider.objects.bulk_create([Slider(title='جدید', image='sliders/test.jpg', url='https://example.com/')])
+        self.assertEqual(self.slider_titles(home.get_home_snapshot()), [])
+
+        with mock.patch.object(home.time, 'time', return_value=home.time.time() + home.SNAPSHOT_TTL + 1):
+            self.assertEqual(self.slider_titles(home.get_home_snapshot()), ['جدید'])
@@ -0,0 +1,43 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _version_key(name):
+    return f'cache_version:{name}'
+
+
+def get_cache_version(name):
+    """
+    نسخه فعلی یک کش (برای ساخت کلیدهای نسخه‌دار)
+    با bump_cache_version همه کلیدهای نسخه قبلی عملاً باطل می‌شوند.
+    """
+    version = cache.get(_version_key(name))
+    if version is None:
+        # اگر کلید از کش پاک شده باشد، از زمان فعلی شروع می‌کنیم تا با نسخه‌های قدیمی تداخل نکند
+        version = int(time.time() * 1000)
+        if not cache.add(_version_key(name), version, None):
+            version = cache.get(_version_key(name), version)
+    return version
+
+
+def bump_cache_version(name):
+    try:
+        return cache.incr(_version_key(name))
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(_version_key(name), version, None)
+        return version
+
+
+# بک‌اندهایی که داده را فقط در حافظه همان پروسه نگه می‌دارند (یا اصلاً نگه نمی‌دارند)
+PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias='default'):
+    """آیا کش بین همه پروسه‌ها (workerها، cron) مشترک است؟"""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', PER_PROCESS_CACHE_BACKENDS[0])
+    return backend not in PER_PROCESS_CACHE_BACKENDS
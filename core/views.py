@@ -1,45 +1,16 @@
 from django.http import HttpResponse
 from django.shortcuts import render
-from core.models import HomeBanner, Slider, SearchHistory
-from products.models import Product, Category
-from django.db.models import Count
+from core.models import SearchHistory
+from core.home import get_home_snapshot
+from products.models import Product
+from products.search import search_products
+from products import autocomplete
 from django.contrib.auth.decorators import login_required
 
 
 def home(request):
-    # 1. اسلایدرهای اصلی
-    sliders = Slider.objects.filter(is_active=True)
-
-    # 2. بنرها
-    banners = HomeBanner.objects.filter(is_active=True).order_by('order')
-    context_banners = {
-        'top_left': banners.filter(position='top_left')[:2],
-        'mid_two': banners.filter(position='mid_two')[:2],
-        'bottom_four': banners.filter(position='bottom_four')[:4]
-    }
-
-    # 3. محصولات شگفت‌انگیز
-    amazing_products = Product.objects.filter(
-        status=Product.Status.PUBLISHED,
-        is_available=True,
-        stock__gt=0,
-        is_special=True,
-        discount_price__isnull=False
-    ).exclude(discount_price=0).order_by('-updated_at')[:10]
-
-    # 4. جدیدترین محصولات
-    latest_products = Product.objects.filter(
-        status=Product.Status.PUBLISHED,
-        is_available=True
-    ).order_by('-created_at')[:12]
-
-    context = {
-        'sliders': sliders,
-        'banners': context_banners,
-        'amazing_products': amazing_products,
-        'latest_products': latest_products,
-    }
-    return render(request, 'core/home.html', context)
+    # اسلایدرها، بنرها و محصولات از اسنپ‌شات کش‌شده صفحه اصلی
+    return render(request, 'core/home.html', get_home_snapshot())
 
 
 def search_box(request):
@@ -57,15 +28,24 @@ def search_box(request):
             'popular_searches': popular_searches
         })
 
-    related_categories = Category.objects.filter(
-        products__name__icontains=query,
-        products__status=Product.Status.PUBLISHED
-    ).annotate(count=Count('id')).filter(count__gt=0).distinct()[:3]
-
-    suggestions = Product.objects.filter(
-        name__icontains=query,
-        status=Product.Status.PUBLISHED
-    ).only('name', 'slug', 'image', 'price', 'discount_price')[:5]
+    # پیشنهادها از ایندکس پیشوندی داخل حافظه خوانده می‌شوند (بدون کوئری دیتابیس)
+    suggestions, category_matches = autocomplete.suggest(query)
+
+    if not suggestions:
+        # برای غلط‌های تایپی و عبارت‌های وسط نام، جستجوی رتبه‌بندی‌شده دیتابیس
+        suggestions = [
+            autocomplete.product_payload(product)
+            for product in search_products(Product.objects.filter(status=Product.Status.PUBLISHED), query)
+            .select_related('category')
+            .order_by('-rank', '-id')[:5]
+        ]
+
+    related_categories = list(category_matches)
+    for product in suggestions:
+        category = {'name': product['category_name'], 'slug': product['category_slug']}
+        if category not in related_categories:
+            related_categories.append(category)
+    related_categories = related_categories[:3]
 
     context = {
         'query': query,
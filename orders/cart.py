@@ -1,18 +1,179 @@
 from decimal import Decimal
 from django.conf import settings
 from products.models import Product
-import copy
+from .models import CartLine
 
 CART_SESSION_ID = 'cart'
 
 
+class CartStore:
+    """
+    محل نگهداری خطوط سبد؛ Cart فقط با همین رابط کار می‌کند
+    خطوط به صورت {product_id (رشته): {'quantity', 'price'}} برگردانده می‌شوند.
+    """
+
+    def lines(self):
+        raise NotImplementedError
+
+    def set_lines(self, lines):
+        """درج یا بروزرسانی چند خط: {product_id: (quantity, price)}"""
+        raise NotImplementedError
+
+    def remove_lines(self, product_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def set_line(self, product_id, quantity, price):
+        self.set_lines({product_id: (quantity, price)})
+
+    def remove_line(self, product_id):
+        self.remove_lines([product_id])
+
+
+class SessionCartStore(CartStore):
+    """
+    سبد کاربر مهمان در سشن: {product_id: {'quantity', 'price'}}
+    تا اولین تغییر چیزی در سشن نوشته نمی‌شود.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def lines(self):
+        return self.session.get(CART_SESSION_ID) or {}
+
+    def set_lines(self, lines):
+        current = self.lines()
+        for product_id, (quantity, price) in lines.items():
+            current[str(product_id)] = {'quantity': quantity, 'price': str(price)}
+        self.session[CART_SESSION_ID] = current
+        self.session.modified = True
+
+    def remove_lines(self, product_ids):
+        current = self.lines()
+        removed = [current.pop(str(product_id), None) for product_id in product_ids]
+        if any(line is not None for line in removed):
+            self.session[CART_SESSION_ID] = current
+            self.session.modified = True
+
+    def clear(self):
+        self.session.pop(CART_SESSION_ID, None)
+
+
+class DatabaseCartStore(CartStore):
+    """
+    سبد کاربر لاگین‌شده در جدول CartLine (مستقل از دستگاه و سشن)
+    افزودن/تغییر یک خط یک INSERT ... ON CONFLICT و حذف آن یک DELETE است.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._lines = None
+
+    def lines(self):
+        if self._lines is None:
+            self._lines = {
+                str(product_id): {'quantity': quantity, 'price': price}
+                for product_id, quantity, price in CartLine.objects.filter(user=self.user)
+                .values_list('product_id', 'quantity', 'price')
+            }
+        return self._lines
+
+    def set_lines(self, lines):
+        """درج یا بروزرسانی چند خط با یک کوئری: {product_id: (quantity, price)}"""
+        CartLine.objects.bulk_create(
+            [
+                CartLine(user=self.user, product_id=product_id, quantity=quantity, price=price)
+                for product_id, (quantity, price) in lines.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'price', 'updated_at'],
+        )
+        if self._lines is not None:
+            for product_id, (quantity, price) in lines.items():
+                self._lines[str(product_id)] = {'quantity': quantity, 'price': price}
+
+    def remove_lines(self, product_ids):
+        CartLine.objects.filter(user=self.user, product_id__in=product_ids).delete()
+        if self._lines is not None:
+            for product_id in product_ids:
+                self._lines.pop(str(product_id), None)
+
+    def clear(self):
+        CartLine.objects.filter(user=self.user).delete()
+        self._lines = {}
+
+
+def get_cart_store(request):
+    if request.user.is_authenticated:
+        # سبد مهمانی که هنگام ورود منتقل نشده (مثلاً سشن‌های قبل از انتقال سبد به دیتابیس)
+        # در اولین دسترسی به سبد منتقل می‌شود
+        if request.session.get(CART_SESSION_ID):
+            merge_session_cart(request)
+        return DatabaseCartStore(request.user)
+    return SessionCartStore(request.session)
+
+
+def merge_session_cart(request):
+    """
+    انتقال سبد مهمان به سبد کاربر بعد از ورود
+    تعداد هر کالا با سبد قبلی کاربر جمع و به موجودی انبار محدود می‌شود.
+    """
+    session_store = SessionCartStore(request.session)
+    session_lines = session_store.lines()
+    if not session_lines:
+        return
+
+    user_store = DatabaseCartStore(request.user)
+    user_lines = user_store.lines()
+    products = Product.objects.in_bulk([int(product_id) for product_id in session_lines])
+
+    merged = {}
+    for product_id, line in session_lines.items():
+        product = products.get(int(product_id))
+        if product is None:
+            continue
+        existing = user_lines.get(product_id)
+        quantity = min(line['quantity'] + (existing['quantity'] if existing else 0), product.stock)
+        price = existing['price'] if existing else int(line['price'])
+        if quantity > 0:
+            merged[product.id] = (quantity, price)
+
+    if merged:
+        user_store.set_lines(merged)
+    session_store.clear()
+
+
+def get_cart(request):
+    """
+    سبد خرید درخواست فعلی؛ ویو، کانتکست‌پروسسور و همه قالب‌ها از یک نمونه استفاده می‌کنند
+    تا خطوط، محصولات و جمع‌ها فقط یک بار در هر درخواست محاسبه شوند.
+    """
+    cart = getattr(request, '_cart', None)
+    if cart is None:
+        cart = request._cart = Cart(request)
+    return cart
+
+
 class Cart:
     def __init__(self, request):
-        self.session = request.session
-        cart = self.session.get(CART_SESSION_ID)
-        if not cart:
-            cart = self.session[CART_SESSION_ID] = {}
-        self.cart = cart
+        # مهمان: سشن / کاربر لاگین‌شده: جدول CartLine
+        self.store = get_cart_store(request)
+        self._items = None
+        self._summary = None
+        # تغییرات آخرین revalidate (برای نمایش به کاربر)
+        self.changes = []
+
+    @property
+    def cart(self):
+        return self.store.lines()
+
+    def _reset(self):
+        self._items = None
+        self._summary = None
 
     def add(self, product, quantity=1, override_quantity=False):
         product_id = str(product.id)
@@ -30,47 +191,111 @@ class Cart:
             # اگر بیشتر از موجودی خواست، سقف رو میذاریم همون موجودی انبار
             new_qty = product.stock
 
-        if product_id not in self.cart:
-            self.cart[product_id] = {
-                'quantity': 0,
-                'price': str(product.final_price)
-            }
-
-        self.cart[product_id]['quantity'] = new_qty
-        self.save()
+        # قیمت خط همان قیمت لحظه اولین افزودن می‌ماند
+        line = self.cart.get(product_id)
+        price = line['price'] if line else product.final_price
+        self.store.set_line(product.id, new_qty, price)
+        self._reset()
 
     def remove(self, product):
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
+        if str(product.id) in self.cart:
+            self.store.remove_line(product.id)
+            self._reset()
 
-    def __iter__(self):
+    @staticmethod
+    def _make_item(product, line):
+        price = int(line['price'])
+        return {
+            'product': product,
+            'quantity': line['quantity'],
+            'price': price,
+            'total_price': price * line['quantity'],
+        }
+
+    @property
+    def items(self):
+        """
+        آیتم‌های سبد با محصولاتشان (یک کوئری برای همه خطوط، یک بار در هر نمونه)
+        خط محصولی که دیگر وجود ندارد نمایش داده نمی‌شود.
+        """
+        if self._items is None:
+            lines = self.cart
+            products = Product.objects.select_related('brand').in_bulk([int(pk) for pk in lines])
+            self._items = [
+                self._make_item(products[int(pk)], line)
+                for pk, line in lines.items() if int(pk) in products
+            ]
+        return self._items
+
+    def revalidate(self):
         """
-        پیمایش آیتم‌های سبد خرید
+        تطبیق سبد با داده‌های فعلی محصولات (قیمت نهایی، موجودی، وضعیت انتشار و موجود بودن)
+        همه محصولات با همان یک کوئری items خوانده می‌شوند و تغییرات با یک نوشتن در سبد ذخیره می‌شوند:
+        خط کالای ناموجود حذف، تعداد به موجودی محدود و قیمت به قیمت فعلی بروز می‌شود.
+        خروجی: لیست تغییرات [{'product', 'removed', 'old_price', 'old_quantity'}] که در self.changes هم می‌ماند.
         """
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
+        lines = self.cart
+        items = self.items
+        found = {item['product'].id for item in items}
+        removed_ids = [int(pk) for pk in lines if int(pk) not in found]
+
+        changes = []
+        updated = {}
+        valid_items = []
+        for item in items:
+            product = item['product']
+            if product.status != Product.Status.PUBLISHED or not product.is_available or product.stock <= 0:
+                removed_ids.append(product.id)
+                changes.append({'product': product, 'removed': True})
+                continue
+
+            quantity = min(item['quantity'], product.stock)
+            price = product.final_price
+            if quantity != item['quantity'] or price != item['price']:
+                updated[product.id] = (quantity, price)
+                change = {'product': product, 'removed': False}
+                if price != item['price']:
+                    change['old_price'] = item['price']
+                if quantity != item['quantity']:
+                    change['old_quantity'] = item['quantity']
+                changes.append(change)
+                item = dict(self._make_item(product, {'quantity': quantity, 'price': price}), change=change)
+            valid_items.append(item)
 
-        cart = copy.deepcopy(self.cart)
+        if removed_ids:
+            self.store.remove_lines(removed_ids)
+        if updated:
+            self.store.set_lines(updated)
+        if removed_ids or updated:
+            self._items = valid_items
+            self._summary = None
+        self.changes = changes
+        return changes
 
-        for product in products:
-            cart[str(product.id)]['product'] = product
+    def get_item(self, product):
+        """آیتم یک محصول برای رندر همان خط (بدون کوئری محصولات دیگر)"""
+        line = self.cart.get(str(product.id))
+        return self._make_item(product, line) if line else None
 
-        for item in cart.values():
-            item['price'] = int(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+    def __iter__(self):
+        return iter(self.items)
+
+    def _get_summary(self):
+        # تعداد و جمع از خود خطوط (برای نشان سبد در همه صفحات، بدون کوئری محصولات)
+        if self._summary is None:
+            lines = self.cart.values()
+            self._summary = (
+                sum(line['quantity'] for line in lines),
+                sum(int(line['price']) * line['quantity'] for line in lines),
+            )
+        return self._summary
 
     def __len__(self):
-        return sum(item['quantity'] for item in self.cart.values())
+        return self._get_summary()[0]
 
     def get_total_price(self):
-        return sum(int(item['price']) * item['quantity'] for item in self.cart.values())
+        return self._get_summary()[1]
 
     def clear(self):
-        del self.session[CART_SESSION_ID]
-        self.save()
-
-    def save(self):
-        self.session.modified = True
\ No newline at end of file
+        self.store.clear()
+        self._reset()
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_alter_orderitem_options_alter_order_is_paid_and_more'),
+        ('products', '0024_review_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='تعداد')),
+                ('price', models.PositiveIntegerField(verbose_name='قیمت واحد هنگام افزودن')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='محصول')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_lines', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'آیتم سبد خرید',
+                'verbose_name_plural': 'آیتم\u200cهای سبد خرید',
+                'constraints': [models.UniqueConstraint(fields=('user', 'product'), name='unique_cart_line_per_product')],
+            },
+        ),
+    ]
@@ -41,6 +41,26 @@ class Order(models.Model):
         return self.total_price
 
 
+class CartLine(models.Model):
+    """یک خط سبد خرید کاربر لاگین‌شده (هر تغییر سبد فقط همین ردیف را می‌نویسد)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart_lines',
+                             verbose_name='کاربر')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name='محصول')
+    quantity = models.PositiveIntegerField(default=1, verbose_name='تعداد')
+    price = models.PositiveIntegerField(verbose_name='قیمت واحد هنگام افزودن')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'آیتم سبد خرید'
+        verbose_name_plural = 'آیتم‌های سبد خرید'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_cart_line_per_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.product_id} (x{self.quantity})"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE, verbose_name='سفارش')
     product = models.ForeignKey(Product, related_name='order_items', on_delete=models.CASCADE, verbose_name='محصول')
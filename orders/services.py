@@ -0,0 +1,55 @@
+from django.db import transaction
+from products.counters import increment as increment_counter
+from products.models import Product
+from .models import Order, OrderItem
+
+
+class CartChangedError(Exception):
+    """سبد از زمان تایید کاربر تغییر کرده (قیمت، موجودی یا وضعیت محصول)"""
+
+
+def format_address(address):
+    # آدرس کامل به صورت رشته در سفارش ذخیره می‌شود (Snapshot)
+    return f"{address.province}، {address.city}، {address.full_address} - کدپستی: {address.postal_code}"
+
+
+@transaction.atomic
+def place_order(user, address, lines):
+    """
+    ثبت سفارش از خطوط سبد ({product_id: {'quantity', 'price'}}) در یک تراکنش
+    همه محصولات با یک کوئری قفل و خوانده می‌شوند و مبلغ از قیمت فعلی آن‌ها محاسبه می‌شود؛
+    آیتم‌ها با یک bulk_create درج می‌شوند، پس تعداد کوئری‌ها به تعداد خطوط بستگی ندارد
+    و خطا در میانه کار سفارش نیمه‌کاره‌ای باقی نمی‌گذارد.
+    اگر محصولی ناموجود شده یا قیمتش با قیمت تاییدشده در سبد فرق دارد CartChangedError می‌دهد.
+    """
+    # قفل به ترتیب شناسه تا دو سفارش همزمان روی محصولات مشترک بن‌بست نسازند
+    products = Product.objects.select_for_update().order_by('pk').in_bulk([int(pk) for pk in lines])
+
+    items = []
+    for pk, line in lines.items():
+        product = products.get(int(pk))
+        if (
+            product is None
+            or product.status != Product.Status.PUBLISHED
+            or not product.is_available
+            or product.stock < line['quantity']
+        ):
+            raise CartChangedError(f"کالای شماره {pk} دیگر به این تعداد موجود نیست.")
+        if product.final_price != int(line['price']):
+            raise CartChangedError(f"قیمت «{product.name}» تغییر کرده است.")
+        items.append(OrderItem(product=product, price=product.final_price, quantity=line['quantity']))
+
+    order = Order.objects.create(
+        user=user,
+        full_name=address.recipient_name,
+        phone_number=address.phone_number,
+        address=format_address(address),
+        total_price=sum(item.price * item.quantity for item in items),
+    )
+    for item in items:
+        item.order = order
+    OrderItem.objects.bulk_create(items)
+    # شمارنده فروش (رتبه‌بندی پیشنهادهای جستجو) بعد از commit سفارش
+    for item in items:
+        increment_counter(Product, 'sales_count', item.product_id, item.quantity)
+    return order
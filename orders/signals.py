@@ -1,5 +1,7 @@
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
+from products.counters import increment as increment_counter
+from products.models import Product
 from .models import Order
 
 
@@ -25,4 +27,5 @@ def manage_stock_on_status_change(sender, instance, **kwargs):
     elif instance.status == Order.Status.CANCELLED and old_order.status != Order.Status.CANCELLED:
         for item in instance.items.all():
             item.product.stock += item.quantity
-            item.product.save()
\ No newline at end of file
+            item.product.save()
+            increment_counter(Product, 'sales_count', item.product_id, -item.quantity)
\ No newline at end of file
@@ -1,3 +1,224 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.sessions.models import Session
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import Address, User, Vendor
+from products.models import Category, Product
+
+from .cart import CART_SESSION_ID
+from .models import CartLine, Order
+
+
+def create_product(phone_number, stock=5):
+    user = User.objects.create_user(phone_number=phone_number)
+    vendor = Vendor.objects.create(user=user, store_name='فروشگاه تست', slug='test-store')
+    category = Category.objects.create(name='موبایل', slug='mobile')
+    product = Product.objects.create(
+        vendor=vendor,
+        category=category,
+        model_name='A1',
+        slug='test-a1',
+        image='products/covers/test.jpg',
+        price=1000,
+        stock=stock,
+        status=Product.Status.PUBLISHED,
+    )
+    return user, product
+
+
+def session_writes(queries):
+    return [
+        query['sql'] for query in queries.captured_queries
+        if 'django_session' in query['sql'] and not query['sql'].lstrip().upper().startswith('SELECT')
+    ]
+
+
+class AnonymousSessionTests(TestCase):
+    """مرور فقط‌خواندنی نباید سشنی بسازد؛ سبد و لیست مقایسه با اولین تغییر ساخته می‌شوند"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.product = create_product('09120000001')
+
+    def assertNoSessionWrites(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session_writes(queries), [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_read_only_pages_do_not_write_session(self):
+        for url in [
+            reverse('core:home'),
+            reverse('products:product_list'),
+            self.product.get_absolute_url(),
+            reverse('products:compare_products'),
+            reverse('orders:cart_detail'),
+        ]:
+            with self.subTest(url=url):
+                self.assertNoSessionWrites(url)
+        self.assertFalse(Session.objects.exists())
+
+    def test_cart_is_created_on_first_add(self):
+        self.client.post(reverse('orders:cart_add', args=[self.product.id]))
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(self.client.session[CART_SESSION_ID][str(self.product.id)]['quantity'], 1)
+
+        # با سشن موجود هم مرور صفحات چیزی در سشن نمی‌نویسد
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.product.get_absolute_url())
+        self.assertEqual(session_writes(queries), [])
+
+    def test_removing_from_empty_compare_list_does_not_create_session(self):
+        self.client.get(reverse('products:remove_from_compare', args=[self.product.id]))
+        self.assertFalse(Session.objects.exists())
+
+
+class CartStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.product = create_product('09120000002', stock=3)
+
+    def test_user_cart_writes_single_line(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('orders:cart_add', args=[self.product.id]))
+        self.client.post(reverse('orders:cart_add', args=[self.product.id]))
+        line = CartLine.objects.get(user=self.user, product=self.product)
+        self.assertEqual((line.quantity, line.price), (2, 1000))
+
+        self.client.post(reverse('orders:cart_remove', args=[self.product.id]))
+        self.assertFalse(CartLine.objects.filter(user=self.user).exists())
+
+    def test_guest_cart_is_merged_on_login(self):
+        CartLine.objects.create(user=self.user, product=self.product, quantity=2, price=900)
+        self.client.post(reverse('orders:cart_add', args=[self.product.id]))
+        self.client.post(reverse('orders:cart_add', args=[self.product.id]))
+
+        session = self.client.session
+        session['auth_mobile'] = self.user.phone_number
+        session.save()
+        cache.set(f'otp_{self.user.phone_number}', '12345')
+        self.client.post(reverse('accounts:verify_otp'), {'code': '12345'})
+
+        line = CartLine.objects.get(user=self.user, product=self.product)
+        # جمع دو سبد، محدود به موجودی انبار؛ قیمت خط قبلی کاربر حفظ می‌شود
+        self.assertEqual((line.quantity, line.price), (3, 900))
+        self.assertNotIn(CART_SESSION_ID, self.client.session)
+
+    def test_leftover_guest_cart_is_merged_on_first_access(self):
+        # سشن لاگین‌شده‌ای که سبدش هنوز در سشن است (ورود قبل از انتقال سبد به دیتابیس)
+        self.client.force_login(self.user)
+        session = self.client.session
+        session[CART_SESSION_ID] = {str(self.product.id): {'quantity': 2, 'price': '1000'}}
+        session.save()
+
+        response = self.client.get(reverse('orders:cart_detail'))
+        self.assertContains(response, f'id="cart-line-{self.product.id}"')
+        line = CartLine.objects.get(user=self.user, product=self.product)
+        self.assertEqual((line.quantity, line.price), (2, 1000))
+        self.assertNotIn(CART_SESSION_ID, self.client.session)
+
+    def test_cart_page_queries_products_once(self):
+        self.client.post(reverse('orders:cart_add', args=[self.product.id]))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders:cart_detail'))
+        self.assertContains(response, f'id="cart-line-{self.product.id}"')
+        product_queries = [query for query in queries.captured_queries if 'FROM "products_product"' in query['sql']]
+        self.assertEqual(len(product_queries), 1)
+
+    def test_quantity_update_renders_only_changed_line(self):
+        self.client.post(reverse('orders:cart_add', args=[self.product.id]))
+        response = self.client.post(
+            reverse('orders:cart_update_quantity', args=[self.product.id, 'increment']),
+            HTTP_HX_REQUEST='true',
+        )
+        self.assertEqual(response['HX-Reswap'], 'none')
+        self.assertContains(response, f'id="cart-line-{self.product.id}" hx-swap-oob="true"')
+        self.assertContains(response, 'id="cart-badge" hx-swap-oob="true"')
+        self.assertNotContains(response, 'id="cart-container"')
+
+        # حذف آخرین خط: کل محتوای صفحه سبد (حالت خالی) جایگزین می‌شود
+        response = self.client.post(reverse('orders:cart_remove_htmx', args=[self.product.id]))
+        self.assertContains(response, 'id="cart-container" hx-swap-oob="true"')
+
+
+class CartRevalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.product = create_product('09120000003', stock=5)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        CartLine.objects.create(user=self.user, product=self.product, quantity=4, price=1000)
+
+    def test_cart_page_applies_current_price_and_stock(self):
+        Product.objects.filter(pk=self.product.pk).update(discount_price=800, stock=2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders:cart_detail'))
+        self.assertContains(response, 'id="cart-changes"')
+        product_queries = [query for query in queries.captured_queries if 'FROM "products_product"' in query['sql']]
+        self.assertEqual(len(product_queries), 1)
+
+        line = CartLine.objects.get(user=self.user, product=self.product)
+        self.assertEqual((line.quantity, line.price), (2, 800))
+
+        # بار دوم تغییری نیست
+        response = self.client.get(reverse('orders:cart_detail'))
+        self.assertNotContains(response, 'id="cart-changes"')
+
+    def test_checkout_with_changed_price_is_not_placed(self):
+        Product.objects.filter(pk=self.product.pk).update(discount_price=900)
+        response = self.client.post(reverse('orders:order_create'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'id="cart-changes"')
+        self.assertEqual(response.context['cart'].get_total_price(), 3600)
+
+    def test_unavailable_product_is_removed(self):
+        Product.objects.filter(pk=self.product.pk).update(is_available=False)
+        response = self.client.get(reverse('orders:order_create'))
+        self.assertRedirects(response, reverse('orders:cart_detail'))
+        self.assertFalse(CartLine.objects.filter(user=self.user).exists())
+
+
+class PlaceOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.product = create_product('09120000004', stock=10)
+        cls.address = Address.objects.create(
+            user=cls.user, title='خانه', recipient_name='تست', phone_number='09120000004',
+            province='تهران', city='تهران', full_address='خیابان تست', postal_code='1234567890',
+        )
+        cls.products = [cls.product]
+        for i in range(5):
+            copy = Product.objects.get(pk=cls.product.pk)
+            copy.pk = None
+            copy.slug = f'test-a1-{i}'
+            copy.model_name = f'A1-{i}'
+            copy.save()
+            cls.products.append(copy)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def checkout(self, products):
+        CartLine.objects.bulk_create(
+            CartLine(user=self.user, product=product, quantity=2, price=product.final_price) for product in products
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('orders:order_create'), {'address_id': self.address.id})
+        self.assertEqual(response.status_code, 302)
+        return len(queries.captured_queries)
+
+    def test_order_queries_do_not_grow_with_cart_lines(self):
+        small = self.checkout(self.products[:2])
+        large = self.checkout(self.products)
+        self.assertEqual(small, large)
+
+        order = Order.objects.latest('id')
+        self.assertEqual(order.items.count(), len(self.products))
+        self.assertEqual(order.total_price, 2 * 1000 * len(self.products))
+        self.assertFalse(CartLine.objects.filter(user=self.user).exists())
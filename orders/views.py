@@ -1,43 +1,64 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from django.urls import reverse
 from django.views.decorators.http import require_POST
+from django_htmx.http import reswap
 from products.models import Product
-from .models import Order, OrderItem
+from .models import Order
 from .forms import OrderCreateForm
-from .cart import Cart
+from .cart import get_cart
+from .services import CartChangedError, place_order
 from django.conf import settings
 from .zarinpal import ZarinPal
 from accounts.models import Address
 
 
+def render_cart_updates(request, cart, product, was_empty, is_new_line=False, cart_page=False):
+    """
+    پاسخ HTMX تغییر یک خط سبد: خط تغییرکرده، نشان سبد و جمع‌ها به صورت out-of-band
+    HX-Reswap: none برای دکمه‌هایی که هنوز هدف قدیمی (کل منوی سبد) را دارند هم درست کار می‌کند.
+    """
+    context = {
+        'cart': cart,
+        'item': cart.get_item(product),
+        'product_id': product.id,
+        'was_empty': was_empty,
+        'is_new_line': is_new_line,
+        'cart_page': cart_page,
+    }
+    return reswap(render(request, 'orders/includes/cart_updates.html', context), 'none')
+
+
 @require_POST
 def cart_add(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
+    was_empty = len(cart) == 0
+    is_new_line = str(product.id) not in cart.cart
     cart.add(product=product)
-
-    return render(request, 'orders/includes/cart_dropdown.html', {'cart': cart})
+    return render_cart_updates(request, cart, product, was_empty, is_new_line)
 
 
 @require_POST
 def cart_remove(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
-
-    return render(request, 'orders/includes/cart_dropdown.html', {'cart': cart})
+    return render_cart_updates(request, cart, product, was_empty=False)
 
 
 def cart_detail(request):
-    cart = Cart(request)
+    cart = get_cart(request)
+    # قیمت و موجودی خطوط با داده‌های فعلی محصولات تطبیق داده می‌شود
+    cart.revalidate()
     return render(request, 'orders/cart_detail.html', {'cart': cart})
 
 
 @require_POST
 def cart_update_quantity(request, product_id, action):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
 
     # پیدا کردن تعداد فعلی در سبد
@@ -53,7 +74,7 @@ def cart_update_quantity(request, product_id, action):
         else:
             cart.remove(product)
 
-    return render(request, 'orders/includes/cart_content.html', {'cart': cart})
+    return render_cart_updates(request, cart, product, was_empty=False, cart_page=True)
 
 
 @require_POST
@@ -61,19 +82,26 @@ def cart_remove_htmx(request, product_id):
     """
     نسخه مخصوص حذف در صفحه سبد خرید (بدون رفرش)
     """
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
-    return render(request, 'orders/includes/cart_content.html', {'cart': cart})
+    return render_cart_updates(request, cart, product, was_empty=False, cart_page=True)
 
 
 @login_required
 def order_create(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     if len(cart) == 0:
         return redirect('products:product_list')
 
-    if request.method == 'POST':
+    # مبلغ سفارش از قیمت فعلی محصولات؛ خطوط ناموجود حذف و تعدادها به موجودی محدود می‌شوند
+    changes = cart.revalidate()
+    if len(cart) == 0:
+        messages.warning(request, 'کالاهای سبد خرید شما دیگر موجود نیستند.')
+        return redirect('orders:cart_detail')
+
+    # اگر سبد تغییر کرده، سفارش ثبت نمی‌شود تا کاربر مبلغ جدید را ببیند و دوباره تایید کند
+    if request.method == 'POST' and not changes:
         # گرفتن ID آدرس انتخاب شده از فرم
         address_id = request.POST.get('address_id')
 
@@ -82,30 +110,17 @@ def order_create(request):
                 # امنیت: مطمئن میشیم آدرس مال خود کاربره
                 address = Address.objects.get(id=address_id, user=request.user)
 
-                # ساخت سفارش با کپی کردن اطلاعات آدرس
-                order = Order.objects.create(
-                    user=request.user,
-                    full_name=address.recipient_name,
-                    phone_number=address.phone_number,
-                    # آدرس کامل رو به صورت رشته ذخیره میکنیم (Snapshot)
-                    address=f"{address.province}، {address.city}، {address.full_address} - کدپستی: {address.postal_code}",
-                    total_price=cart.get_total_price()
-                )
-
-                # انتقال آیتم‌های سبد به OrderItem
-                for item in cart:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=item['product'],
-                        price=item['price'],
-                        quantity=item['quantity']
-                    )
-
+                # ثبت سفارش در یک تراکنش با قیمت‌های فعلی (قفل محصولات و درج دسته‌ای آیتم‌ها)
+                order = place_order(request.user, address, cart.cart)
                 cart.clear()
                 return redirect('orders:request_payment', order_id=order.id)
 
             except Address.DoesNotExist:
                 pass
+            except CartChangedError as e:
+                # بین تایید و ثبت، محصول یا قیمتش عوض شده؛ صفحه دوباره سبد را تطبیق می‌دهد
+                messages.warning(request, str(e))
+                return redirect('orders:order_create')
 
     # آدرس‌های کاربر رو میفرستیم به قالب
     user_addresses = request.user.addresses.all()
@@ -15,7 +15,7 @@ class ProductImageInline(TabularInline):
 class ProductAttributeInline(admin.TabularInline):
     model = ProductAttribute
     extra = 1
-    fields = ['key', 'label', 'is_filterable', 'is_main', 'order']
+    fields = ['key', 'label', 'value_type', 'unit', 'is_filterable', 'is_main', 'order']
 
 
 class MegaMenuItemInline(admin.TabularInline):
@@ -44,6 +44,7 @@ class CategoryAdmin(DraggableMPTTAdmin):
 @admin.register(AttributeGroup)
 class AttributeGroupAdmin(ModelAdmin):
     list_display = ['name', 'category', 'order']
+    list_select_related = ['category']
     list_filter = ['category']
     search_fields = ['name', 'category__name']
 
@@ -69,6 +70,7 @@ class ProductAdmin(ModelAdmin):
     # 1. اضافه کردن wishlist_count به لیست نمایش
     list_display = ['name', 'price_display', 'stock','is_special', 'vendor', 'category', 'status', 'wishlist_count', 'cover_preview']
     list_editable = ['is_special', 'stock']
+    list_select_related = ['vendor', 'category']
     list_filter = ['status', 'is_available', 'created_at', 'vendor', 'category']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
@@ -115,16 +117,29 @@ class ProductAdmin(ModelAdmin):
 
     cover_preview.short_description = "Cover"
 
-    # متد محاسبه تعداد لایک‌ها
+    # تعداد لایک‌ها از شمارنده ذخیره‌شده (بدون COUNT روی جدول علاقه‌مندی‌ها)
     def wishlist_count(self, obj):
-        return obj.wishlist.count()
+        return obj.wishlist_count
 
     wishlist_count.short_description = "❤️ Likes"
-    wishlist_count.admin_order_field = 'wishlist'  # قابلیت سورت کردن بر اساس تعداد لایک
+    wishlist_count.admin_order_field = 'wishlist_count'  # سورت روی ستون ایندکس‌دار
+
+
+@admin.register(Review)
+class ReviewAdmin(ModelAdmin):
+    list_display = ['product', 'user', 'score', 'likes_count', 'dislikes_count', 'created_at']
+    list_select_related = ['product', 'user']
+    list_filter = ['score', 'recommendation', 'created_at']
+    search_fields = ['comment', 'product__name', 'user__phone_number']
+    autocomplete_fields = ['product', 'user']
+    readonly_fields = ['likes_count', 'dislikes_count', 'created_at']
+    # مفیدترین نظرات اول؛ سورت روی ستون ایندکس‌دار شمارنده
+    ordering = ['-likes_count', '-id']
 
 
 @admin.register(MegaMenuColumn)
 class MegaMenuColumnAdmin(ModelAdmin):
     list_display = ['title', 'category', 'order']
+    list_select_related = ['category']
     list_filter = ['category']
     inlines = [MegaMenuItemInline]
\ No newline at end of file
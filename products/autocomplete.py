@@ -0,0 +1,474 @@
+import logging
+import os
+import sys
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from core.utils import get_cache_version, bump_cache_version
+from .models import Product, Category
+from .utils import normalize_persian
+
+# شماره آخرین تغییر در لاگ مشترک تغییرات (همان نسخه کش)
+CACHE_VERSION_NAME = 'autocomplete'
+
+# محدودیت‌های حافظه (قابل تغییر در settings)
+# سقف تعداد گره‌های Trie هر ایندکس؛ حجم حافظه با تعداد گره‌ها رشد می‌کند، نه تعداد آیتم‌ها
+MAX_NODES = getattr(settings, 'AUTOCOMPLETE_MAX_NODES', 200000)
+MAX_PREFIX_LENGTH = getattr(settings, 'AUTOCOMPLETE_MAX_PREFIX_LENGTH', 20)
+TOP_K = getattr(settings, 'AUTOCOMPLETE_TOP_K', 8)
+
+# فاصله زمانی (ثانیه) بین خواندن تغییرات پروسه‌های دیگر از لاگ مشترک
+SYNC_INTERVAL = getattr(settings, 'AUTOCOMPLETE_SYNC_INTERVAL', 5)
+# اگر پروسه بیش از این تعداد تغییر عقب باشد (یا رکوردی از لاگ حذف شده باشد) ایندکس از نو ساخته می‌شود
+MAX_REPLAY = 1000
+# رکوردهای غایب نزدیک انتهای لاگ احتمالاً هنوز در حال نوشتن‌اند و تا sync بعدی صبر می‌کنیم
+IN_FLIGHT_MARGIN = 20
+LOG_TIMEOUT = 60 * 60 * 24
+# شمارنده‌های محبوبیت (فروش و علاقه‌مندی) بدون سیگنال تغییر می‌کنند؛
+# ترتیب پیشنهادها هر REBUILD_INTERVAL ثانیه با یک ساخت کامل در پس‌زمینه بروز می‌شود
+REBUILD_INTERVAL = getattr(settings, 'AUTOCOMPLETE_REBUILD_INTERVAL', 60 * 60)
+# بعد از این تعداد خروج آیتم از لیست برتر پر یک گره، لیست‌ها ناقص حساب می‌شوند و ایندکس از نو ساخته می‌شود
+MAX_GAPS = 1000
+# ساخت ایندکس در ترد جداگانه؛ با False همان فراخوانی ایندکس را می‌سازد
+BACKGROUND_BUILD = getattr(settings, 'AUTOCOMPLETE_BACKGROUND_BUILD', True)
+
+logger = logging.getLogger(__name__)
+
+
+class _Node:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # کلید آیتم‌ها به ترتیب نزولی وزن (حداکثر TOP_K)
+
+
+class AutocompleteIndex:
+    """
+    ایندکس پیشوندی (Trie) در حافظه برای پیشنهادهای جستجوی هدر
+    هر گره فقط TOP_K آیتم پرطرفدار زیرشاخه خود را نگه می‌دارد،
+    پس پاسخ یک پیشوند بدون پیمایش زیردرخت و بدون دیتابیس آماده است.
+    پیشوند از ابتدای هر کلمه نام ایندکس می‌شود ("سامسونگ" در "گوشی موبایل سامسونگ").
+    """
+
+    def __init__(self, max_nodes=MAX_NODES, max_prefix_length=MAX_PREFIX_LENGTH, top_k=TOP_K):
+        self.max_nodes = max_nodes
+        self.max_prefix_length = max_prefix_length
+        self.top_k = top_k
+        self.root = _Node()
+        self.entries = {}
+        self.node_count = 1
+        # تعداد دفعاتی که آیتمی از لیست برتر پر یک گره خارج شد (ممکن است آیتمی که جا نشده بود جایش را بگیرد)
+        self.gaps = 0
+
+    # --- ساخت و بروزرسانی ---
+
+    def _paths(self, text):
+        """زیررشته‌های شروع‌شونده از ابتدای هر کلمه (کوتاه‌شده به حداکثر طول پیشوند)"""
+        paths = set()
+        position = 0
+        for word in text.split(' '):
+            paths.add(text[position:position + self.max_prefix_length])
+            position += len(word) + 1
+        return paths
+
+    def _new_nodes(self, paths):
+        """تعداد گره‌هایی که برای درج این مسیرها ساخته می‌شوند"""
+        created = set()
+        for path in paths:
+            node = self.root
+            for length in range(1, len(path) + 1):
+                node = node.children.get(path[length - 1]) if node is not None else None
+                if node is None:
+                    created.add(path[:length])
+        return len(created)
+
+    def is_full(self):
+        return self.node_count >= self.max_nodes
+
+    def add(self, key, label, weight, payload):
+        """
+        درج یا بروزرسانی یک آیتم؛ اگر گره‌های لازم از سقف max_nodes بیشتر شوند آیتم درج نمی‌شود.
+        بروزرسانی با همان متن فقط وزن و payload را عوض می‌کند و لیست‌های برتر را ناقص نمی‌کند.
+        """
+        text = normalize_persian(label)
+        if not text:
+            self.remove(key)
+            return False
+
+        entry = self.entries.get(key)
+        if entry is not None and entry['text'] == text:
+            entry['payload'] = payload
+            if weight != entry['weight']:
+                self._reweight(key, entry, weight)
+            return True
+        if entry is not None:
+            self.remove(key)
+
+        paths = self._paths(text)
+        if self.node_count + self._new_nodes(paths) > self.max_nodes:
+            return False
+        self.entries[key] = {'text': text, 'weight': weight, 'payload': payload}
+
+        for path in paths:
+            node = self.root
+            for char in path:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _Node()
+                    self.node_count += 1
+                node = child
+                self._push(node, key, weight)
+        return True
+
+    def _push(self, node, key, weight):
+        top = node.top
+        if key in top:
+            return
+        if len(top) >= self.top_k and self.entries[top[-1]]['weight'] >= weight:
+            return
+        # درج مرتب (لیست حداکثر TOP_K عضو دارد)
+        index = len(top)
+        while index > 0 and self.entries[top[index - 1]]['weight'] < weight:
+            index -= 1
+        top.insert(index, key)
+        del top[self.top_k:]
+
+    def _reweight(self, key, entry, weight):
+        decreased = weight < entry['weight']
+        entry['weight'] = weight
+        has_gap = False
+        for path in self._paths(entry['text']):
+            node = self.root
+            for char in path:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                if key in node.top:
+                    # با کاهش وزن در لیست پر، آیتمی که جا نشده بود ممکن است بالاتر باشد
+                    has_gap = has_gap or (decreased and len(node.top) >= self.top_k)
+                    node.top.remove(key)
+                self._push(node, key, weight)
+        if has_gap:
+            self.gaps += 1
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        has_gap = False
+        for path in self._paths(entry['text']):
+            node = self.root
+            trail = []
+            for char in path:
+                child = node.children.get(char)
+                if child is None:
+                    break
+                was_full = len(child.top) >= self.top_k
+                trail.append((node, char, child, was_full))
+                node = child
+                if key in node.top:
+                    has_gap = has_gap or was_full
+                    node.top.remove(key)
+            # گره‌های انتهایی بدون آیتم و فرزند آزاد می‌شوند
+            # (گره‌ای که لیستش پر بوده ممکن است آیتم‌های جانشده‌ای داشته باشد و نگه داشته می‌شود)
+            for parent, char, child, was_full in reversed(trail):
+                if child.children or child.top or was_full:
+                    break
+                del parent.children[char]
+                self.node_count -= 1
+        if has_gap:
+            self.gaps += 1
+
+    # --- پرس‌وجو ---
+
+    def _find(self, prefix):
+        node = self.root
+        for char in prefix[:self.max_prefix_length]:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def suggest(self, query, limit=5):
+        """
+        پیشنهادهای یک عبارت؛ خروجی لیست payloadها به ترتیب محبوبیت
+        عبارت چندکلمه‌ای اگر پیوسته پیدا نشود، با طولانی‌ترین کلمه جستجو و با بقیه کلمات فیلتر می‌شود.
+        """
+        text = normalize_persian(query)
+        if not text:
+            return []
+
+        node = self._find(text)
+        words = text.split(' ')
+        must_contain = [] if len(text) <= self.max_prefix_length else [text]
+        if node is None and len(words) > 1:
+            longest = max(words, key=len)
+            node = self._find(longest)
+            must_contain = [word for word in words if word != longest]
+        if node is None:
+            return []
+
+        results = []
+        for key in list(node.top):
+            entry = self.entries.get(key)
+            if entry and all(word in entry['text'] for word in must_contain):
+                results.append(entry['payload'])
+                if len(results) >= limit:
+                    break
+        return results
+
+    def stats(self):
+        """تعداد آیتم‌ها و گره‌ها و تخمین حجم حافظه (بایت)"""
+        size = sys.getsizeof(self.entries)
+        for entry in self.entries.values():
+            size += sys.getsizeof(entry) + sys.getsizeof(entry['text']) + sys.getsizeof(entry['payload'])
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            size += sys.getsizeof(node) + sys.getsizeof(node.children) + sys.getsizeof(node.top)
+            stack.extend(node.children.values())
+        return {
+            'entries': len(self.entries),
+            'nodes': self.node_count,
+            'max_nodes': self.max_nodes,
+            'approx_bytes': size,
+        }
+
+
+# --- داده‌های آیتم‌ها ---
+
+def product_payload(product):
+    return {
+        'name': product.name,
+        'url': product.get_absolute_url(),
+        'image_url': product.image.url if product.image else '',
+        'price': product.price,
+        'discount_price': product.discount_price,
+        'is_available': product.is_available,
+        'category_name': product.category.name,
+        'category_slug': product.category.slug,
+    }
+
+
+def category_payload(category):
+    return {'name': category.name, 'slug': category.slug}
+
+
+def product_item(product):
+    """(متن، وزن، payload) محصول در ایندکس؛ محصول منتشرنشده None (حذف از ایندکس)"""
+    if product.status != Product.Status.PUBLISHED:
+        return None
+    # محبوبیت محصول: شمارنده‌های نگهداری‌شده فروش و علاقه‌مندی
+    return product.name, product.sales_count + product.wishlist_count, product_payload(product)
+
+
+def category_item(category):
+    if not category.is_active:
+        return None
+    popularity = category.products.filter(status=Product.Status.PUBLISHED).count()
+    return category.name, popularity, category_payload(category)
+
+
+def build_indexes():
+    """
+    ساخت کامل ایندکس‌ها از دیتابیس
+    محصولات به ترتیب محبوبیت اضافه می‌شوند تا با رسیدن به سقف گره‌ها، کم‌طرفدارترها کنار گذاشته شوند.
+    """
+    categories_index = AutocompleteIndex()
+    categories = Category.objects.filter(is_active=True).annotate(
+        popularity=Count('products', filter=Q(products__status=Product.Status.PUBLISHED))
+    )
+    for category in categories:
+        categories_index.add(category.id, category.name, category.popularity, category_payload(category))
+
+    products_index = AutocompleteIndex()
+    products = Product.objects.filter(status=Product.Status.PUBLISHED).select_related('category').alias(
+        popularity=F('sales_count') + F('wishlist_count')
+    ).order_by('-popularity', '-id')
+    for product in products.iterator(chunk_size=2000):
+        if products_index.is_full():
+            break
+        products_index.add(product.id, *product_item(product))
+
+    return {'products': products_index, 'categories': categories_index}
+
+
+# --- نمونه سراسری پروسه ---
+
+_lock = threading.Lock()
+# seq: آخرین تغییر لاگ که روی ایندکس این پروسه اعمال شده
+# building: pid پروسه‌ای که ساخت را شروع کرده (بعد از fork در پروسه فرزند معتبر نیست)
+_state = {'indexes': None, 'seq': 0, 'synced_at': 0, 'built_at': 0, 'building': None}
+
+
+def _log_key(seq):
+    return f'autocomplete_log:{seq}'
+
+
+def _empty_indexes():
+    return {'products': AutocompleteIndex(), 'categories': AutocompleteIndex()}
+
+
+def _build(seq):
+    indexes = build_indexes()
+    with _lock:
+        _state['indexes'] = indexes
+        _state['seq'] = seq
+        _state['synced_at'] = _state['built_at'] = time.monotonic()
+
+
+def _build_in_background(seq):
+    try:
+        _build(seq)
+    except Exception:
+        # ایندکس قبلی (یا خالی) سرو می‌شود و درخواست‌های بعدی دوباره تلاش می‌کنند
+        logger.exception('Autocomplete index build failed')
+    finally:
+        _state['building'] = None
+        # اتصال دیتابیس مخصوص این ترد
+        connection.close()
+
+
+def start_build():
+    """
+    شروع ساخت کامل ایندکس‌ها در یک ترد پس‌زمینه (اگر همین پروسه در حال ساخت نباشد)
+    شماره لاگ قبل از ساخت خوانده می‌شود تا تغییرات حین ساخت بعداً دوباره اعمال شوند.
+    """
+    with _lock:
+        if _state['building'] == os.getpid():
+            return False
+        _state['building'] = os.getpid()
+    try:
+        seq = get_cache_version(CACHE_VERSION_NAME)
+    except Exception:
+        # کش در دسترس نیست؛ درخواست ادامه پیدا می‌کند و جستجوی هدر به دیتابیس برمی‌گردد
+        logger.exception('Autocomplete log sequence could not be read')
+        _state['building'] = None
+        return False
+    if not BACKGROUND_BUILD:
+        try:
+            _build(seq)
+        finally:
+            _state['building'] = None
+        return True
+    threading.Thread(target=_build_in_background, args=(seq,), daemon=True).start()
+    return True
+
+
+def _apply_change(index, key, item):
+    if item is None:
+        index.remove(key)
+    else:
+        index.add(key, *item)
+
+
+def _sync():
+    """
+    اعمال تغییرات پروسه‌های دیگر از لاگ مشترک روی ایندکس این پروسه (بدون دیتابیس)
+    اگر پروسه خیلی عقب مانده یا رکوردی از لاگ حذف شده، ایندکس در پس‌زمینه از نو ساخته می‌شود.
+    """
+    applied = _state['seq']
+    current = get_cache_version(CACHE_VERSION_NAME)
+    if current == applied:
+        return
+    if current < applied or current - applied > MAX_REPLAY:
+        start_build()
+        return
+
+    seqs = range(applied + 1, current + 1)
+    entries = cache.get_many([_log_key(seq) for seq in seqs])
+    evicted = False
+    with _lock:
+        if _state['seq'] != applied:
+            # ترد دیگری همزمان sync کرده یا ساخت کامل تمام شده
+            return
+        indexes = _state['indexes']
+        for seq in seqs:
+            entry = entries.get(_log_key(seq))
+            if entry is None:
+                evicted = current - seq >= IN_FLIGHT_MARGIN
+                break
+            name, key, item = entry
+            _apply_change(indexes[name], key, item)
+            _state['seq'] = seq
+    if evicted:
+        start_build()
+
+
+def get_indexes():
+    """
+    ایندکس‌های پروسه فعلی؛ ساخت کامل هیچ‌وقت در مسیر درخواست انجام نمی‌شود
+    تا ایندکس اول آماده شود ایندکس خالی برمی‌گردد (جستجوی هدر به دیتابیس برمی‌گردد).
+    تغییرات محصولات و دسته‌ها در پروسه‌های دیگر حداکثر هر SYNC_INTERVAL ثانیه یک بار
+    از لاگ مشترک خوانده و به صورت افزایشی روی همین ایندکس اعمال می‌شوند.
+    """
+    indexes = _state['indexes']
+    if indexes is None:
+        start_build()
+        return _state['indexes'] or _empty_indexes()
+
+    if time.monotonic() - _state['synced_at'] >= SYNC_INTERVAL:
+        _state['synced_at'] = time.monotonic()
+        try:
+            _sync()
+        except Exception:
+            # تا sync بعدی همان ایندکس فعلی سرو می‌شود
+            logger.exception('Autocomplete log replay failed')
+    if (time.monotonic() - _state['built_at'] > REBUILD_INTERVAL
+            or any(index.gaps > MAX_GAPS for index in indexes.values())):
+        start_build()
+    return _state['indexes']
+
+
+def suggest(query, products_limit=5, categories_limit=3):
+    """پیشنهاد محصولات و دسته‌ها برای جعبه جستجو، کاملاً از حافظه"""
+    indexes = get_indexes()
+    return (
+        indexes['products'].suggest(query, limit=products_limit),
+        indexes['categories'].suggest(query, limit=categories_limit),
+    )
+
+
+def _publish(name, key, item):
+    """ثبت تغییر در لاگ مشترک (برای پروسه‌های دیگر) و اعمال روی ایندکس همین پروسه"""
+    seq = bump_cache_version(CACHE_VERSION_NAME)
+    cache.set(_log_key(seq), (name, key, item), LOG_TIMEOUT)
+    with _lock:
+        indexes = _state['indexes']
+        if indexes is None:
+            return
+        _apply_change(indexes[name], key, item)
+        if _state['seq'] == seq - 1:
+            # تغییر دیگری در این فاصله نبوده؛ نیازی به اعمال دوباره هنگام sync نیست
+            _state['seq'] = seq
+
+
+def _publish_on_commit(name, key, item):
+    # تغییری که rollback شود نباید به ایندکس پروسه‌ها برسد
+    transaction.on_commit(lambda: _publish(name, key, item))
+
+
+def update_product(product):
+    _publish_on_commit('products', product.id, product_item(product))
+
+
+def update_products(product_ids):
+    """بروزرسانی چند محصول (بعد از update گروهی)"""
+    for product in Product.objects.filter(pk__in=product_ids).select_related('category'):
+        update_product(product)
+
+
+def remove_product(product_id):
+    _publish_on_commit('products', product_id, None)
+
+
+def update_category(category):
+    _publish_on_commit('categories', category.id, category_item(category))
+
+
+def remove_category(category_id):
+    _publish_on_commit('categories', category_id, None)
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from .wishlist import get_wishlist_ids
+
+CARD_TIMEOUT = 60 * 60 * 24
+
+# قالب کارت محصول در هر بخش سایت
+CARD_TEMPLATES = {
+    'grid': 'products/cards/grid.html',  # لیست محصولات
+    'offer': 'products/cards/offer.html',  # صفحه شگفت‌انگیزها
+    'slide': 'products/cards/slide.html',  # اسلایدر شگفت‌انگیز صفحه اصلی
+    'latest': 'products/cards/latest.html',  # جدیدترین‌های صفحه اصلی
+    'favorite': 'products/cards/favorite.html',  # علاقه‌مندی‌های داشبورد
+}
+
+# جای بخش مخصوص کاربر در HTML کش‌شده (مثل وضعیت علاقه‌مندی)
+USER_SLOT = '<!--product-card-user-slot-->'
+USER_SLOT_TEMPLATE = 'products/cards/wishlist_toggle.html'
+
+
+def card_cache_key(product, variant):
+    """
+    کلید کارت: شناسه + زمان آخرین ویرایش محصول
+    آمار امتیاز بدون تغییر updated_at بروز می‌شود، پس جداگانه در کلید آمده است.
+    """
+    return f'product_card:{variant}:{product.id}:{product.updated_at.timestamp()}:{product.rating_count}:{product.rating_sum}'
+
+
+def render_product_cards(products, variant, request=None):
+    """
+    HTML کارت‌های یک صفحه محصول
+    کارت‌ها برای همه کاربران یکسان‌اند و با یک get_many از کش خوانده می‌شوند؛
+    فقط کارت‌های غایب رندر و با set_many ذخیره می‌شوند.
+    بخش مخصوص کاربر بعد از خواندن از کش جایگزین USER_SLOT می‌شود.
+    """
+    products = list(products)
+    if not products:
+        return ''
+
+    keys = {product.id: card_cache_key(product, variant) for product in products}
+    cached = cache.get_many(list(keys.values()))
+
+    missing = {}
+    cards = []
+    for product in products:
+        key = keys[product.id]
+        html = cached.get(key)
+        if html is None:
+            html = missing[key] = render_to_string(CARD_TEMPLATES[variant], {'product': product})
+        cards.append((product, html))
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+
+    # شناسه‌های علاقه‌مندی کاربر از کش (برای کل صفحه یک بار)
+    is_authenticated = request is not None and request.user.is_authenticated
+    wishlist_ids = get_wishlist_ids(request.user) if is_authenticated else frozenset()
+    output = []
+    for product, html in cards:
+        if USER_SLOT in html:
+            user_html = ''
+            if is_authenticated:
+                user_html = render_to_string(USER_SLOT_TEMPLATE, {
+                    'product': product,
+                    'is_wishlisted': product.id in wishlist_ids,
+                })
+            html = html.replace(USER_SLOT, user_html)
+        output.append(html)
+    return mark_safe(''.join(output))
@@ -0,0 +1,157 @@
+import threading
+from bisect import bisect_left, bisect_right
+from core.utils import get_cache_version
+from .models import Category
+
+CACHE_VERSION_NAME = 'category_tree'
+
+
+class CategoryNode:
+    """نسخه سبک و فقط‌خواندنی یک دسته در اسنپ‌شات درخت"""
+    __slots__ = (
+        'id', 'parent_id', 'tree_id', 'lft', 'rght', 'level',
+        'name', 'full_path', 'slug', 'is_active', 'is_comparison_root',
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CategoryNode is immutable')
+
+    def __repr__(self):
+        return f'<CategoryNode {self.id}: {self.slug}>'
+
+
+class CategoryTree:
+    """
+    اسنپ‌شات تغییرناپذیر درخت دسته‌بندی‌ها (MPTT) در حافظه پروسه
+    لیست اجداد هر دسته از قبل ساخته می‌شود و زیرشاخه‌ها با جستجوی دودویی روی lft پیدا می‌شوند،
+    پس محاسبات درختی در ویوها بدون کوئری انجام می‌شود.
+    """
+
+    def __init__(self, rows):
+        nodes = {}
+        for row in rows:
+            node = CategoryNode(**row)
+            nodes[node.id] = node
+        self.nodes = nodes
+        self.by_slug = {node.slug: node for node in nodes.values()}
+
+        # اجداد هر دسته (از ریشه تا خود دسته) و بالاترین جد دارای تیک مقایسه
+        self._ancestors = {}
+        self._comparison_roots = {}
+        for node in sorted(nodes.values(), key=lambda n: n.level):
+            parent_chain = self._ancestors.get(node.parent_id, ())
+            self._ancestors[node.id] = parent_chain + (node.id,)
+            parent_root = self._comparison_roots.get(node.parent_id)
+            self._comparison_roots[node.id] = parent_root or (node.id if node.is_comparison_root else None)
+
+        # برای هر درخت: lftها و idها به ترتیب پیمایش، تا زیرشاخه یک بازه پیوسته باشد
+        self._lfts = {}
+        self._ordered_ids = {}
+        # گزینه‌های فیلدهای انتخاب دسته (مسیر کامل به ترتیب درخت)
+        self.choices = []
+        for node in sorted(nodes.values(), key=lambda n: (n.tree_id, n.lft)):
+            self._lfts.setdefault(node.tree_id, []).append(node.lft)
+            self._ordered_ids.setdefault(node.tree_id, []).append(node.id)
+            self.choices.append((node.id, node.full_path or node.name))
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def get_by_slug(self, slug):
+        return self.by_slug.get(slug)
+
+    def ancestor_ids(self, category_id, include_self=True):
+        """شناسه اجداد از ریشه به پایین"""
+        ids = self._ancestors.get(category_id, ())
+        return ids if include_self else ids[:-1]
+
+    def ancestors(self, category_id, include_self=True):
+        return [self.nodes[pk] for pk in self.ancestor_ids(category_id, include_self)]
+
+    def descendant_ids(self, category_id, include_self=True):
+        """شناسه دسته‌های زیرشاخه به ترتیب درخت"""
+        node = self.nodes.get(category_id)
+        if node is None:
+            return []
+        lfts = self._lfts[node.tree_id]
+        start = bisect_left(lfts, node.lft) if include_self else bisect_right(lfts, node.lft)
+        end = bisect_right(lfts, node.rght)
+        return self._ordered_ids[node.tree_id][start:end]
+
+    def comparison_root(self, category_id):
+        """بالاترین جدی که اجازه مقایسه زیرمجموعه‌ها را دارد (یا None)"""
+        root_id = self._comparison_roots.get(category_id)
+        return self.nodes[root_id] if root_id else None
+
+    def comparison_scope(self, category_id):
+        """
+        محدوده مقایسه یک دسته: شناسه ریشه مقایسه، یا خود دسته اگر ریشه‌ای ندارد
+        دو محصول فقط وقتی قابل مقایسه‌اند که محدوده یکسان داشته باشند.
+        """
+        return self._comparison_roots.get(category_id) or category_id
+
+    def comparable_category_ids(self, scope_id):
+        """دسته‌هایی که محصولاتشان در این محدوده مقایسه قرار می‌گیرند"""
+        if self._comparison_roots.get(scope_id) == scope_id:
+            return self.descendant_ids(scope_id)
+        return [scope_id]
+
+    def are_comparable(self, first_category_id, second_category_id):
+        return self.comparison_scope(first_category_id) == self.comparison_scope(second_category_id)
+
+
+def build_tree():
+    return CategoryTree(Category.objects.values(*CategoryNode.__slots__))
+
+
+# --- نمونه سراسری پروسه ---
+
+_lock = threading.Lock()
+_state = {'tree': None, 'version': None}
+
+
+def get_category_tree():
+    """
+    اسنپ‌شات فعلی درخت؛ با ذخیره/حذف دسته نسخه کش عوض می‌شود
+    و هر پروسه در اولین درخواست بعدی اسنپ‌شات را از نو می‌سازد.
+    """
+    version = get_cache_version(CACHE_VERSION_NAME)
+    tree = _state['tree']
+    if tree is None or _state['version'] != version:
+        with _lock:
+            if _state['tree'] is tree:
+                _state['tree'] = build_tree()
+                _state['version'] = version
+    return _state['tree']
+
+
+def refresh_category_tree():
+    """ساخت دوباره اسنپ‌شات همین پروسه، بدون توجه به نسخه کش"""
+    version = get_cache_version(CACHE_VERSION_NAME)
+    with _lock:
+        _state['tree'] = build_tree()
+        _state['version'] = version
+    return _state['tree']
+
+
+def _find(lookup, **db_filter):
+    node = lookup(get_category_tree())
+    # دسته‌ای که همین حالا ساخته شده ولی تغییر نسخه‌اش هنوز به این پروسه نرسیده؛
+    # فقط وقتی در دیتابیس وجود دارد اسنپ‌شات از نو ساخته می‌شود (slug ناموجود کوئری سنگینی نمی‌زند)
+    if node is None and Category.objects.filter(**db_filter).exists():
+        node = lookup(refresh_category_tree())
+    return node
+
+
+def find_category(category_id):
+    """گره یک دسته با شناسه (یا None)"""
+    return _find(lambda tree: tree.get(category_id), pk=category_id)
+
+
+def find_category_by_slug(slug):
+    """گره یک دسته با slug (یا None)"""
+    return _find(lambda tree: tree.get_by_slug(slug), slug=slug)
@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from core.utils import get_cache_version
+from .models import Product
+from .schema import CACHE_VERSION_NAME as SCHEMA_CACHE_VERSION, get_category_schema
+from .category_tree import get_category_tree
+
+COMPARE_SESSION_KEY = 'compare_list'
+# محدوده مقایسه لیست فعلی (ریشه مقایسه یا دسته اولین محصول)
+COMPARE_SCOPE_SESSION_KEY = 'compare_scope'
+COMPARISON_TIMEOUT = 60 * 60
+
+
+def get_compare_list(request):
+    return request.session.get(COMPARE_SESSION_KEY, [])
+
+
+def get_compare_scope(request, compare_list):
+    """
+    محدوده مقایسه ذخیره‌شده در سشن
+    برای سشن‌هایی که قبل از ذخیره محدوده ساخته شده‌اند، از دسته اولین محصول محاسبه می‌شود
+    (و فقط با تغییر بعدی لیست در سشن نوشته می‌شود؛ خواندن سشن را تغییر نمی‌دهد).
+    """
+    if not compare_list:
+        return None
+    scope = request.session.get(COMPARE_SCOPE_SESSION_KEY)
+    if scope is None:
+        category_id = Product.objects.filter(id=compare_list[0]).values_list('category_id', flat=True).first()
+        if category_id is not None:
+            scope = get_category_tree().comparison_scope(category_id)
+    return scope
+
+
+def save_compare_list(request, compare_list, scope):
+    # لیست خالی از سشن حذف می‌شود (pop فقط اگر کلید وجود داشته باشد سشن را تغییر می‌دهد)
+    if compare_list:
+        request.session[COMPARE_SESSION_KEY] = compare_list
+        request.session[COMPARE_SCOPE_SESSION_KEY] = scope
+    else:
+        request.session.pop(COMPARE_SESSION_KEY, None)
+        request.session.pop(COMPARE_SCOPE_SESSION_KEY, None)
+
+
+def comparison_cache_key(stamps):
+    """
+    کلید ماتریس مقایسه: شناسه‌های مرتب‌شده + زمان ویرایش هر محصول
+    (و نسخه ساختار ویژگی‌ها، چون ردیف‌های جدول از آن ساخته می‌شوند)
+    """
+    signature = '-'.join(f'{pk}.{updated_at.timestamp()}' for pk, updated_at in sorted(stamps))
+    return f'comparison:{get_cache_version(SCHEMA_CACHE_VERSION)}:{signature}'
+
+
+def build_comparison(product_ids):
+    products = list(Product.objects.filter(id__in=product_ids))
+    comparison_data = []
+    if products:
+        comparison_data = get_category_schema(products[0].category_id).comparison_rows(products)
+    return {'products': products, 'comparison_data': comparison_data}
+
+
+def get_comparison(product_ids):
+    """
+    محصولات و ردیف‌های جدول مقایسه، یک بار ساخته و کش می‌شود
+    صفحه کامل و پارشیال HTMX هر دو از همین نتیجه رندر می‌شوند.
+    """
+    if not product_ids:
+        return {'products': [], 'comparison_data': []}
+
+    stamps = list(Product.objects.filter(id__in=product_ids).values_list('id', 'updated_at'))
+    if not stamps:
+        return {'products': [], 'comparison_data': []}
+
+    cache_key = comparison_cache_key(stamps)
+    comparison = cache.get(cache_key)
+    if comparison is None:
+        comparison = build_comparison([pk for pk, _ in stamps])
+        cache.set(cache_key, comparison, COMPARISON_TIMEOUT)
+    return comparison
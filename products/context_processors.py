@@ -1,18 +1,53 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.functional import SimpleLazyObject
+from django.utils.safestring import mark_safe
+from core.utils import get_cache_version
 from .models import Category
+from .wishlist import get_wishlist_ids
+
+MEGA_MENU_CACHE_VERSION = 'mega_menu'
+MEGA_MENU_TIMEOUT = 60 * 60 * 24
+
+
+def render_mega_menu():
+    """
+    HTML رندرشده بخش دسته‌بندی‌های مگا‌منو
+    کلید کش نسخه‌دار است و با ذخیره/حذف دسته، ستون یا آیتم منو نسخه عوض می‌شود.
+    """
+    cache_key = f'mega_menu:{get_cache_version(MEGA_MENU_CACHE_VERSION)}'
+    html = cache.get(cache_key)
+    if html is None:
+        # فقط دسته‌های اصلی که فعال هستند
+        # prefetch_related برای جلوگیری از کوئری‌های تکراری (N+1 Problem)
+        root_categories = list(Category.objects.filter(level=0, is_active=True).prefetch_related(
+            'children',  # زیر دسته‌های درختی
+            'menu_columns__items',  # ستون‌های مگا‌منو و آیتم‌هایش
+        ))
+        html = render_to_string('includes/mega_menu_categories.html', {
+            'main_menu_categories': root_categories,
+            'first_category_id': root_categories[0].id if root_categories else None,
+        })
+        cache.set(cache_key, html, MEGA_MENU_TIMEOUT)
+    return mark_safe(html)
 
 
 def menu_categories(request):
     """
-    این تابع دسته‌بندی‌های ریشه (Level 0) را به همراه
-    فرزندان و ستون‌های مگا‌منو لود می‌کند تا در هدر نمایش داده شوند.
+    مگا‌منوی هدر به صورت تنبل (Lazy)
+    تابع فقط وقتی صدا زده می‌شود که قالب واقعاً {{ mega_menu_html }} را رندر کند،
+    پس پاسخ‌های پارشیال HTMX هیچ هزینه‌ای برای منو ندارند.
     """
-    # فقط دسته‌های اصلی که فعال هستند
-    # prefetch_related برای جلوگیری از کوئری‌های تکراری (N+1 Problem)
-    root_categories = Category.objects.filter(level=0, is_active=True).prefetch_related(
-        'children',  # زیر دسته‌های درختی
-        'menu_columns__items',  # ستون‌های مگا‌منو و آیتم‌هایش
-    )
+    return {
+        'mega_menu_html': render_mega_menu
+    }
+
 
+def wishlist(request):
+    """
+    شناسه محصولات علاقه‌مندی کاربر برای قالب‌ها: {% if product.id in wishlist_ids %}
+    فقط در صورت استفاده در قالب (و حداکثر یک بار در هر درخواست) از کش خوانده می‌شود.
+    """
     return {
-        'main_menu_categories': root_categories
-    }
\ No newline at end of file
+        'wishlist_ids': SimpleLazyObject(lambda: get_wishlist_ids(request.user))
+    }
@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from core.utils import is_shared_cache
+from .models import Product, Review, ReviewVote
+
+logger = logging.getLogger(__name__)
+
+# اعمال بافر در دیتابیس بعد از این تعداد تغییر یا این فاصله زمانی (ثانیه)، هر کدام زودتر برسد
+FLUSH_BATCH_SIZE = getattr(settings, 'COUNTER_FLUSH_BATCH_SIZE', 200)
+FLUSH_INTERVAL = getattr(settings, 'COUNTER_FLUSH_INTERVAL', 30)
+# flush در ترد جداگانه (خارج از مسیر درخواست)؛ با False همان درخواست flush می‌کند
+BACKGROUND_FLUSH = getattr(settings, 'COUNTER_BACKGROUND_FLUSH', True)
+# حداکثر رکورد خوانده‌شده از لاگ در هر flush
+FLUSH_MAX_ENTRIES = 5000
+# رکوردهای غایب نزدیک انتهای لاگ احتمالاً هنوز در حال نوشتن‌اند و تا flush بعدی صبر می‌کنیم
+IN_FLIGHT_MARGIN = 50
+BUFFER_TIMEOUT = 60 * 60 * 24
+
+SEQ_KEY = 'counter_log:seq'
+FLUSHED_KEY = 'counter_log:flushed'
+LAST_FLUSH_KEY = 'counter_log:last_flush'
+LOCK_KEY = 'counter_log:lock'
+
+
+def _log_key(seq):
+    return f'counter_log:{seq}'
+
+
+def _delta_key(label, field, pk):
+    return f'counter_delta:{label}:{field}:{pk}'
+
+
+def _incr(key, delta, timeout=BUFFER_TIMEOUT):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout)
+        return cache.incr(key, delta)
+
+
+def _apply(label, field, pk, delta):
+    apps.get_model(label).objects.filter(pk=pk).update(**{
+        field: Greatest(F(field) + delta, Value(0)),
+    })
+
+
+def _flush_in_background():
+    try:
+        flush_counters()
+    except Exception:
+        # رکوردهای لاگ سر جایشان می‌مانند و flush بعدی دوباره تلاش می‌کند
+        logger.exception('Counter flush failed')
+    finally:
+        # اتصال دیتابیس مخصوص این ترد
+        connection.close()
+
+
+def _buffer(label, field, pk, delta):
+    _incr(_delta_key(label, field, pk), delta)
+    seq = _incr(SEQ_KEY, 1, None)
+    cache.set(_log_key(seq), (label, field, pk, delta), BUFFER_TIMEOUT)
+
+    state = cache.get_many([FLUSHED_KEY, LAST_FLUSH_KEY, LOCK_KEY])
+    pending = seq - state.get(FLUSHED_KEY, 0)
+    is_due = pending >= FLUSH_BATCH_SIZE or time.time() - state.get(LAST_FLUSH_KEY, 0) >= FLUSH_INTERVAL
+    if is_due and LOCK_KEY not in state:
+        if BACKGROUND_FLUSH:
+            threading.Thread(target=_flush_in_background, daemon=True).start()
+        else:
+            flush_counters()
+
+
+def increment(model, field, pk, delta=1):
+    """
+    ثبت تغییر یک شمارنده در بافر کش (write-behind)
+    هر تغییر یک رکورد در لاگ ترتیبی کش است و flush_counters آن‌ها را دسته‌ای
+    و با یک UPDATE برای هر ردیف در دیتابیس اعمال می‌کند؛ پس لایک‌ها و علاقه‌مندی‌های
+    همزمان روی یک ردیف قفل نمی‌گیرند. تا زمان flush، تغییر در کلید delta همان شیء
+    نگه داشته می‌شود تا with_pending مقدار بروز را نمایش دهد.
+    بافر فقط روی کش مشترک بین پروسه‌ها (Redis) فعال است؛ روی کش مخصوص هر پروسه
+    تغییرات گم می‌شدند، پس همان لحظه مستقیم در دیتابیس اعمال می‌شوند.
+    تغییر بعد از commit تراکنش فراخواننده ثبت می‌شود؛ با rollback (مثلاً رأی‌ای که ذخیره نشد) شمارنده دست نمی‌خورد.
+    """
+    if not delta:
+        return
+    label = model._meta.label_lower
+    if not is_shared_cache():
+        transaction.on_commit(lambda: _apply(label, field, pk, delta))
+    else:
+        transaction.on_commit(lambda: _buffer(label, field, pk, delta))
+
+
+def flush_counters():
+    """
+    اعمال تغییرات بافرشده در دیتابیس (مجموع تغییرات هر شمارنده در یک UPDATE)
+    با قفل کش فقط یک پروسه در هر لحظه flush می‌کند. خروجی: تعداد شمارنده‌های بروزشده
+    """
+    if not is_shared_cache() or not cache.add(LOCK_KEY, 1, 60):
+        return 0
+    try:
+        flushed = cache.get(FLUSHED_KEY, 0)
+        current = min(cache.get(SEQ_KEY, 0), flushed + FLUSH_MAX_ENTRIES)
+        seqs = range(flushed + 1, current + 1)
+        entries = cache.get_many([_log_key(seq) for seq in seqs])
+
+        totals = {}
+        last = flushed
+        lost = 0
+        for seq in seqs:
+            entry = entries.get(_log_key(seq))
+            if entry is None:
+                if current - seq < IN_FLIGHT_MARGIN:
+                    break
+                # رکورد از کش حذف شده (مثلاً با سیاست حذف حافظه Redis)
+                lost += 1
+                last = seq
+                continue
+            label, field, pk, delta = entry
+            totals[(label, field, pk)] = totals.get((label, field, pk), 0) + delta
+            last = seq
+
+        if lost:
+            logger.error(
+                '%s counter log entries were evicted from the cache before flush; '
+                'run the reconcile_counters command to repair the counters.', lost,
+            )
+
+        with transaction.atomic():
+            for (label, field, pk), delta in totals.items():
+                if delta:
+                    _apply(label, field, pk, delta)
+
+        for (label, field, pk), delta in totals.items():
+            if delta:
+                _incr(_delta_key(label, field, pk), -delta)
+        cache.set(FLUSHED_KEY, last, None)
+        cache.set(LAST_FLUSH_KEY, time.time(), None)
+        cache.delete_many([_log_key(seq) for seq in range(flushed + 1, last + 1)])
+        return len(totals)
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def with_pending(objects, *fields):
+    """
+    افزودن تغییرات هنوز flush نشده به شمارنده‌های اشیاء (یک get_many برای کل لیست)
+    خروجی لیست همان اشیاء است.
+    """
+    objects = list(objects)
+    if not objects or not is_shared_cache():
+        return objects
+    label = objects[0]._meta.label_lower
+    keys = {(obj.pk, field): _delta_key(label, field, obj.pk) for obj in objects for field in fields}
+    deltas = cache.get_many(list(keys.values()))
+    if deltas:
+        for obj in objects:
+            for field in fields:
+                delta = deltas.get(keys[(obj.pk, field)])
+                if delta:
+                    setattr(obj, field, max(getattr(obj, field) + delta, 0))
+    return objects
+
+
+def _related_count(model, column, **filters):
+    return Coalesce(Subquery(
+        model.objects.filter(**{column: OuterRef('pk')}, **filters)
+        .values(column).annotate(count=Count('*')).values('count')
+    ), 0)
+
+
+def _sales_count():
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    return Coalesce(Subquery(
+        OrderItem.objects.filter(product_id=OuterRef('pk')).exclude(order__status='cancelled')
+        .values('product_id').annotate(total=Sum('quantity')).values('total')
+    ), 0)
+
+
+def reconcile_counters():
+    """
+    محاسبه مجدد شمارنده‌ها از جداول علاقه‌مندی، رأی‌ها و آیتم‌های سفارش (برای دستور مدیریتی)
+    اول بافر flush می‌شود تا تغییرات قبلی دوباره حساب نشوند.
+    """
+    flush_counters()
+    products = Product.objects.update(
+        wishlist_count=_related_count(Product.wishlist.through, 'product_id'),
+        sales_count=_sales_count(),
+    )
+    reviews = Review.objects.update(
+        likes_count=_related_count(ReviewVote, 'review_id', value=ReviewVote.Value.LIKE),
+        dislikes_count=_related_count(ReviewVote, 'review_id', value=ReviewVote.Value.DISLIKE),
+    )
+    return products, reviews
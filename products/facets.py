@@ -0,0 +1,223 @@
+from decimal import Decimal
+from django.db.models import Count, Q, Min, Max
+from .models import Product, ProductFacet, ProductAttribute, ProductNumericSpec
+from .utils import parse_number, format_number
+from .category_tree import get_category_tree
+from .schema import get_category_schema
+from .filters import apply_spec_filters, get_spec_filters
+
+
+def normalize_facet_value(value):
+    """تبدیل مقدار ویژگی به رشته تمیز (همان چیزی که در سایدبار نمایش داده می‌شود)"""
+    if value is None:
+        return ''
+    return str(value).strip()[:255]
+
+
+def build_product_facets(product):
+    """ساخت ردیف‌های ایندکس برای یک محصول (بدون ذخیره)"""
+    facets = []
+    for key, raw_value in (product.specifications or {}).items():
+        value = normalize_facet_value(raw_value)
+        if value:
+            facets.append(ProductFacet(
+                product_id=product.id,
+                category_id=product.category_id,
+                key=key,
+                value=value,
+            ))
+    return facets
+
+
+# محدوده ستون ProductNumericSpec.value (DecimalField با max_digits=14 و decimal_places=4)
+_VALUE_FIELD = ProductNumericSpec._meta.get_field('value')
+NUMERIC_SPEC_LIMIT = 10 ** (_VALUE_FIELD.max_digits - _VALUE_FIELD.decimal_places)
+NUMERIC_SPEC_QUANTUM = Decimal(1).scaleb(-_VALUE_FIELD.decimal_places)
+
+
+def parse_spec_value(raw_value):
+    """
+    مقدار عددی قابل ذخیره در ستون value (گرد شده تا ۴ رقم اعشار)
+    اعداد خارج از محدوده ستون (مثل شماره سریال یا IMEI) کنار گذاشته می‌شوند (None).
+    """
+    value = parse_number(raw_value)
+    # بررسی قبل از quantize: عدد خیلی بزرگ از دقت context دسیمال هم بیشتر است
+    if value is None or abs(value) >= NUMERIC_SPEC_LIMIT:
+        return None
+    value = value.quantize(NUMERIC_SPEC_QUANTUM)
+    return value if abs(value) < NUMERIC_SPEC_LIMIT else None
+
+
+def build_numeric_specs(product, numeric_keys):
+    """ساخت ردیف‌های مقدار عددی برای ویژگی‌های عددی یک محصول (بدون ذخیره)"""
+    specs = product.specifications or {}
+    rows = []
+    for key in numeric_keys:
+        value = parse_spec_value(specs.get(key))
+        if value is not None:
+            rows.append(ProductNumericSpec(
+                product_id=product.id,
+                category_id=product.category_id,
+                key=key,
+                value=value,
+            ))
+    return rows
+
+
+def get_numeric_keys(category_id):
+    """کلید ویژگی‌های عددی تعریف‌شده برای یک دسته و اجدادش"""
+    return {
+        attr.key for attr in get_category_schema(category_id).attributes
+        if attr.value_type == ProductAttribute.ValueType.NUMBER
+    }
+
+
+def sync_product_facets(product):
+    """
+    بروزرسانی ایندکس فیلترها و مقادیر عددی یک محصول
+    فقط محصولات منتشرشده در ایندکس حضور دارند.
+    """
+    ProductFacet.objects.filter(product_id=product.id).delete()
+    ProductNumericSpec.objects.filter(product_id=product.id).delete()
+    if product.status == Product.Status.PUBLISHED:
+        ProductFacet.objects.bulk_create(build_product_facets(product))
+        ProductNumericSpec.objects.bulk_create(build_numeric_specs(product, get_numeric_keys(product.category_id)))
+
+
+def clear_numeric_attribute(attribute, key):
+    """حذف مقادیر عددی یک کلید در زیرشاخه دسته ویژگی"""
+    categories = get_category_tree().descendant_ids(attribute.group.category_id)
+    ProductNumericSpec.objects.filter(category__in=categories, key=key).delete()
+
+
+def sync_numeric_attribute(attribute):
+    """
+    بروزرسانی مقادیر عددی یک ویژگی در کل زیرشاخه دسته‌اش
+    (بعد از تغییر نوع مقدار یا کلید ویژگی در پنل ادمین)
+    """
+    categories = get_category_tree().descendant_ids(attribute.group.category_id)
+    ProductNumericSpec.objects.filter(category__in=categories, key=attribute.key).delete()
+    if attribute.value_type != ProductAttribute.ValueType.NUMBER:
+        return
+
+    products = Product.objects.filter(
+        category__in=categories,
+        status=Product.Status.PUBLISHED,
+    ).only('id', 'category_id', 'specifications')
+    rows = []
+    for product in products.iterator(chunk_size=1000):
+        rows.extend(build_numeric_specs(product, [attribute.key]))
+    ProductNumericSpec.objects.bulk_create(rows, batch_size=5000)
+
+
+def sync_products_facets(product_ids):
+    """بروزرسانی ایندکس فیلترها و مقادیر عددی چند محصول (بعد از update گروهی)"""
+    ProductFacet.objects.filter(product_id__in=product_ids).delete()
+    ProductNumericSpec.objects.filter(product_id__in=product_ids).delete()
+    products = Product.objects.filter(
+        pk__in=product_ids,
+        status=Product.Status.PUBLISHED,
+    ).only('id', 'category_id', 'specifications')
+    facets = []
+    numeric_specs = []
+    for product in products.iterator(chunk_size=1000):
+        facets.extend(build_product_facets(product))
+        numeric_specs.extend(build_numeric_specs(product, get_numeric_keys(product.category_id)))
+    ProductFacet.objects.bulk_create(facets, batch_size=5000)
+    ProductNumericSpec.objects.bulk_create(numeric_specs, batch_size=5000)
+
+
+def rebuild_facets():
+    """ساخت مجدد کل ایندکس (برای دستور مدیریتی)"""
+    ProductFacet.objects.all().delete()
+    ProductNumericSpec.objects.all().delete()
+    products = Product.objects.filter(status=Product.Status.PUBLISHED).only('id', 'category_id', 'specifications')
+    batch = []
+    for product in products.iterator(chunk_size=1000):
+        batch.extend(build_product_facets(product))
+        if len(batch) >= 5000:
+            ProductFacet.objects.bulk_create(batch)
+            batch = []
+    ProductFacet.objects.bulk_create(batch)
+
+    for attribute in ProductAttribute.objects.filter(value_type=ProductAttribute.ValueType.NUMBER).select_related('group'):
+        sync_numeric_attribute(attribute)
+
+
+def get_facet_sidebar(attributes, categories, products, params):
+    """
+    ساخت داده‌های سایدبار فیلترها با یک کوئری
+    برای هر مقدار، تعداد محصولاتی که با فیلترهای فعلی مطابقت دارند هم برگردانده می‌شود.
+    products کوئری محصولات قبل از فیلترهای spec_* است: شمارش مقادیر هر ویژگی
+    فیلتر انتخاب‌شده خود همان ویژگی را در نظر نمی‌گیرد (مقادیر دیگر آن ویژگی صفر نمی‌شوند).
+    """
+    attributes = list(attributes)
+    if not attributes:
+        return []
+
+    keys = {attr.key for attr in attributes}
+    selected_keys = keys & set(get_spec_filters(params))
+    count_filter = Q(product__in=apply_spec_filters(products, params).values('id'))
+    if selected_keys:
+        count_filter &= ~Q(key__in=selected_keys)
+    for key in selected_keys:
+        count_filter |= Q(key=key, product__in=apply_spec_filters(products, params, exclude_key=key).values('id'))
+
+    rows = ProductFacet.objects.filter(
+        category__in=categories,
+        key__in=keys,
+    ).values('key', 'value').annotate(
+        count=Count('product_id', filter=count_filter)
+    ).order_by('key', 'value')
+
+    values_by_key = {}
+    for row in rows:
+        values_by_key.setdefault(row['key'], []).append({'value': row['value'], 'count': row['count']})
+
+    sidebar = []
+    seen_keys = set()
+    for attr in attributes:
+        if attr.key in seen_keys or attr.key not in values_by_key:
+            continue
+        seen_keys.add(attr.key)
+        sidebar.append({
+            'key': attr.key,
+            'label': attr.label,
+            'values': values_by_key[attr.key],
+        })
+    return sidebar
+
+
+def get_numeric_ranges(attributes, categories, params):
+    """
+    بازه مقادیر ویژگی‌های عددی (کمینه/بیشینه) با یک کوئری تجمیعی
+    همراه با مقادیر انتخاب‌شده کاربر (min_<key> / max_<key>)
+    """
+    attributes = list(attributes)
+    if not attributes:
+        return []
+
+    bounds = {
+        row['key']: row
+        for row in ProductNumericSpec.objects.filter(
+            category__in=categories,
+            key__in=[attr.key for attr in attributes],
+        ).values('key').annotate(min_value=Min('value'), max_value=Max('value')).order_by()
+    }
+
+    ranges = []
+    seen_keys = set()
+    for attr in attributes:
+        if attr.key in seen_keys or attr.key not in bounds:
+            continue
+        seen_keys.add(attr.key)
+        ranges.append({
+            'key': attr.key,
+            'label': attr.label,
+            'unit': attr.unit,
+            'min': format_number(bounds[attr.key]['min_value']),
+            'max': format_number(bounds[attr.key]['max_value']),
+            'selected_min': parse_spec_value(params.get(f'min_{attr.key}')),
+            'selected_max': parse_spec_value(params.get(f'max_{attr.key}')),
+        })
+    return ranges
@@ -0,0 +1,58 @@
+from django.db.models import Q, Exists, OuterRef
+from .models import ProductNumericSpec
+
+SPEC_PARAM_PREFIX = 'spec_'
+
+
+def spec_containment_q(key, values):
+    """
+    تبدیل مقادیر انتخاب‌شده یک ویژگی به شرط containment
+    هر مقدار یک شرط specifications @> {"key": "value"} است که از ایندکس GIN
+    (jsonb_path_ops) استفاده می‌کند؛ مقادیر یک ویژگی با OR ترکیب می‌شوند.
+    """
+    condition = Q()
+    for value in values:
+        condition |= Q(specifications__contains={key: value})
+    return condition
+
+
+def get_spec_filters(params):
+    """مقادیر انتخاب‌شده پارامترهای spec_<key> به صورت {key: [values]}"""
+    filters = {}
+    for param in params:
+        if param.startswith(SPEC_PARAM_PREFIX):
+            key = param[len(SPEC_PARAM_PREFIX):]
+            selected_values = [value for value in params.getlist(param) if value]
+            if key and selected_values:
+                filters[key] = selected_values
+    return filters
+
+
+def apply_spec_filters(products, params, exclude_key=None):
+    """
+    اعمال پارامترهای spec_<key> روی کوئری (ویژگی‌های مختلف با AND ترکیب می‌شوند)
+    exclude_key: فیلتر این ویژگی اعمال نمی‌شود (برای شمارش مقادیر همان ویژگی در سایدبار)
+    """
+    for key, selected_values in get_spec_filters(params).items():
+        if key != exclude_key:
+            products = products.filter(spec_containment_q(key, selected_values))
+    return products
+
+
+def apply_range_filters(products, numeric_ranges):
+    """
+    اعمال فیلترهای بازه‌ای (min_<key> / max_<key>) روی ویژگی‌های عددی
+    هر بازه یک EXISTS روی ایندکس (key, value) جدول مقادیر عددی است.
+    """
+    for spec_range in numeric_ranges:
+        lower, upper = spec_range['selected_min'], spec_range['selected_max']
+        if lower is None and upper is None:
+            continue
+
+        numeric_specs = ProductNumericSpec.objects.filter(product=OuterRef('pk'), key=spec_range['key'])
+        if lower is not None:
+            numeric_specs = numeric_specs.filter(value__gte=lower)
+        if upper is not None:
+            numeric_specs = numeric_specs.filter(value__lte=upper)
+        products = products.filter(Exists(numeric_specs))
+    return products
@@ -1,5 +1,30 @@
 from django import forms
+from django.forms.models import ModelChoiceIterator
 from .models import Review
+from .category_tree import get_category_tree
+
+
+class CategoryChoiceIterator(ModelChoiceIterator):
+    """گزینه‌ها از اسنپ‌شات درخت دسته‌ها خوانده می‌شوند، نه از کوئری"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from get_category_tree().choices
+
+    def __len__(self):
+        return len(get_category_tree().choices) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_category_tree().choices)
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    """
+    انتخاب دسته با برچسب مسیر کامل (الکترونیک > موبایل)
+    رندر فرم با هر تعداد دسته بدون کوئری اضافه انجام می‌شود؛ فقط مقدار ارسالی در اعتبارسنجی خوانده می‌شود.
+    """
+    iterator = CategoryChoiceIterator
 
 
 class ReviewForm(forms.ModelForm):
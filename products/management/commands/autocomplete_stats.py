@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from products.autocomplete import build_indexes
+
+
+class Command(BaseCommand):
+    help = 'ساخت ایندکس پیشنهاد جستجو و گزارش اندازه آن (تعداد آیتم، گره و حافظه تقریبی)'
+
+    def handle(self, *args, **options):
+        for name, index in build_indexes().items():
+            stats = index.stats()
+            self.stdout.write(
+                f"{name}: {stats['entries']} entries, {stats['nodes']}/{stats['max_nodes']} nodes, "
+                f"~{stats['approx_bytes'] / 1024 / 1024:.2f} MB"
+            )
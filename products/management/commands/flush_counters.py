@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.utils import is_shared_cache
+from products.counters import flush_counters
+
+
+class Command(BaseCommand):
+    help = 'اعمال تغییرات بافرشده شمارنده‌ها در دیتابیس (برای اجرای دوره‌ای با cron)'
+
+    def handle(self, *args, **options):
+        if not is_shared_cache():
+            # بافر در حافظه پروسه‌های وب است و این پروسه به آن دسترسی ندارد
+            raise CommandError('Counter buffering needs a shared cache backend (see CACHES).')
+        count = flush_counters()
+        self.stdout.write(self.style.SUCCESS(f'{count} counters flushed.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from products.facets import rebuild_facets
+from products.models import ProductFacet
+
+
+class Command(BaseCommand):
+    help = 'ساخت مجدد ایندکس فیلترهای سایدبار از روی مشخصات محصولات منتشرشده'
+
+    def handle(self, *args, **options):
+        rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f'{ProductFacet.objects.count()} facet rows rebuilt.'))
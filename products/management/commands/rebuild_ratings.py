@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'محاسبه مجدد تعداد، مجموع و توزیع امتیازهای محصولات از روی نظرات'
+
+    def handle(self, *args, **options):
+        count = rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS(f'Ratings rebuilt for {count} products.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'ساخت مجدد فیلدهای جستجوی متنی (tsvector و عنوان نرمال‌شده) همه محصولات'
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'محاسبه مجدد تعداد علاقه‌مندی محصولات و لایک/دیس‌لایک نظرات از روی جداول اصلی'
+
+    def handle(self, *args, **options):
+        products, reviews = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(f'Counters reconciled for {products} products and {reviews} reviews.'))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_facets(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductFacet = apps.get_model('products', 'ProductFacet')
+    batch = []
+    for product in Product.objects.filter(status='published').iterator(chunk_size=1000):
+        for key, raw_value in (product.specifications or {}).items():
+            value = str(raw_value).strip()[:255] if raw_value is not None else ''
+            if value:
+                batch.append(ProductFacet(product_id=product.id, category_id=product.category_id, key=key, value=value))
+    ProductFacet.objects.bulk_create(batch, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_product_model_name_product_title_desc_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, verbose_name='کلید ویژگی')),
+                ('value', models.CharField(max_length=255, verbose_name='مقدار نرمال\u200cشده')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='products.category', verbose_name='دسته\u200cبندی')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='products.product', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'مقدار فیلتر',
+                'verbose_name_plural': 'ایندکس فیلترها',
+                'indexes': [models.Index(fields=['category', 'key', 'value'], name='products_facet_cat_key_val')],
+            },
+        ),
+        migrations.RunPython(populate_facets, migrations.RunPython.noop),
+    ]
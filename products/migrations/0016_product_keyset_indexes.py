@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_productfacet'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='products_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status', 'price', 'id'], name='products_status_price_idx'),
+        ),
+    ]
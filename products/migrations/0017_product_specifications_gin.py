@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:46
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['specifications'], name='products_specs_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_product_specifications_gin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productattribute',
+            name='unit',
+            field=models.CharField(blank=True, help_text='مثال: GB، اینچ، mAh', max_length=20, verbose_name='واحد'),
+        ),
+        migrations.AddField(
+            model_name='productattribute',
+            name='value_type',
+            field=models.CharField(choices=[('text', 'متنی'), ('number', 'عددی')], default='text', help_text='برای ویژگی\u200cهای عددی (رم، اندازه صفحه، باتری) فیلتر بازه\u200cای نمایش داده می\u200cشود', max_length=10, verbose_name='نوع مقدار'),
+        ),
+        migrations.CreateModel(
+            name='ProductNumericSpec',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, verbose_name='کلید ویژگی')),
+                ('value', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='مقدار عددی')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='numeric_specs', to='products.category', verbose_name='دسته\u200cبندی')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='numeric_specs', to='products.product', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'مقدار عددی ویژگی',
+                'verbose_name_plural': 'مقادیر عددی ویژگی\u200cها',
+                'indexes': [models.Index(fields=['key', 'value'], name='products_numspec_key_val'), models.Index(fields=['category', 'key', 'value'], name='products_numspec_cat_key_val')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'key'), name='unique_numeric_spec_per_product')],
+            },
+        ),
+    ]
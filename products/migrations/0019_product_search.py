@@ -0,0 +1,92 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:49
+
+import re
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import Value
+from django.utils.html import strip_tags
+
+# نسخه ثابت توابع products.utils در زمان این مایگریشن
+# (مایگریشن نباید به کد فعلی اپ وابسته باشد؛ تغییرات بعدی آن‌جا نباید migrate را خراب کند)
+DIGITS_TRANSLATION = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٫', '01234567890123456789.')
+
+ARABIC_TO_PERSIAN_TRANSLATION = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ',
+    '\u200f': None, '\u200e': None,
+    '\u0640': None,
+})
+
+DIACRITICS_PATTERN = re.compile('[\u064B-\u065F\u0670]')
+
+
+def normalize_persian(text):
+    if not text:
+        return ''
+    text = str(text).translate(DIGITS_TRANSLATION).translate(ARABIC_TO_PERSIAN_TRANSLATION)
+    text = DIACRITICS_PATTERN.sub('', text)
+    return ' '.join(text.lower().split())
+
+
+def build_search_title(product):
+    parts = [product.name, product.brand.name if product.brand else '', product.model_name]
+    return normalize_persian(' '.join(part for part in parts if part))
+
+
+def build_search_body(product):
+    return normalize_persian(strip_tags(product.description or ''))
+
+
+def populate_search_fields(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    for product in Product.objects.select_related('brand').iterator(chunk_size=500):
+        brand_and_model = normalize_persian(' '.join(filter(None, [
+            product.brand.name if product.brand else '',
+            product.model_name,
+        ])))
+        Product.objects.filter(pk=product.pk).update(
+            search_title=build_search_title(product),
+            search_vector=(
+                SearchVector(Value(normalize_persian(product.name)), weight='A', config='simple')
+                + SearchVector(Value(brand_and_model), weight='B', config='simple')
+                + SearchVector(Value(build_search_body(product)), weight='C', config='simple')
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_productattribute_value_type_productnumericspec'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_title',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='products_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_title'], name='products_search_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(populate_search_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+def populate_full_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    paths = {}
+    categories = list(Category.objects.order_by('tree_id', 'lft').only('id', 'parent_id', 'name'))
+    for category in categories:
+        parent_path = paths.get(category.parent_id)
+        category.full_path = f'{parent_path} > {category.name}' if parent_path else category.name
+        paths[category.id] = category.full_path
+    Category.objects.bulk_update(categories, ['full_path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_product_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='full_path',
+            field=models.CharField(blank=True, editable=False, max_length=1000, verbose_name='مسیر کامل'),
+        ),
+        migrations.RunPython(populate_full_paths, migrations.RunPython.noop),
+    ]
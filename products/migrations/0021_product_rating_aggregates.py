@@ -0,0 +1,66 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:56
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_ratings(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    rows = Review.objects.filter(score__in=range(1, 6)).values('product_id').annotate(
+        count=Count('id'),
+        total=Sum('score'),
+        **{f'rating_{score}': Count('id', filter=Q(score=score)) for score in range(1, 6)},
+    ).order_by()
+    for row in rows.iterator(chunk_size=1000):
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_count=row['count'],
+            rating_sum=row['total'],
+            **{f'rating_{score}': row[f'rating_{score}'] for score in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0020_category_full_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد امتیازها'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='مجموع امتیازها'),
+        ),
+        migrations.RunPython(populate_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _through_count(through, column):
+    return Coalesce(Subquery(
+        through.objects.filter(**{column: OuterRef('pk')})
+        .values(column).annotate(count=Count('*')).values('count')
+    ), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    Product.objects.update(wishlist_count=_through_count(Product.wishlist.through, 'product_id'))
+    Review.objects.update(
+        likes_count=_through_count(Review.likes.through, 'review_id'),
+        dislikes_count=_through_count(Review.dislikes.through, 'review_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='wishlist_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='تعداد علاقه\u200cمندی'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد دیس\u200cلایک'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد لایک'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+LIKE, DISLIKE = 1, -1
+
+
+def _vote_count(ReviewVote, value):
+    return Coalesce(Subquery(
+        ReviewVote.objects.filter(review_id=OuterRef('pk'), value=value)
+        .values('review_id').annotate(count=Count('*')).values('count')
+    ), 0)
+
+
+def copy_votes(apps, schema_editor):
+    Review = apps.get_model('products', 'Review')
+    ReviewVote = apps.get_model('products', 'ReviewVote')
+    # لایک‌ها اول درج می‌شوند؛ کاربری که هر دو را داشته لایک می‌ماند
+    for through, value in ((Review.likes.through, LIKE), (Review.dislikes.through, DISLIKE)):
+        rows = through.objects.values_list('review_id', 'user_id')
+        batch = [ReviewVote(review_id=review_id, user_id=user_id, value=value) for review_id, user_id in rows.iterator()]
+        ReviewVote.objects.bulk_create(batch, batch_size=1000, ignore_conflicts=True)
+    Review.objects.update(
+        likes_count=_vote_count(ReviewVote, LIKE),
+        dislikes_count=_vote_count(ReviewVote, DISLIKE),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_engagement_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.SmallIntegerField(choices=[(1, 'لایک'), (-1, 'دیس\u200cلایک')], verbose_name='رأی')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='products.review')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_votes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'رأی نظر',
+                'verbose_name_plural': 'رأی\u200cهای نظرات',
+                'constraints': [models.UniqueConstraint(fields=('review', 'user'), name='unique_review_vote_per_user')],
+            },
+        ),
+        migrations.RunPython(copy_votes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='review',
+            name='dislikes',
+        ),
+        migrations.RemoveField(
+            model_name='review',
+            name='likes',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0024_review_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='likes_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='تعداد لایک'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:44
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_sales_count(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Product.objects.update(sales_count=Coalesce(Subquery(
+        OrderItem.objects.filter(product_id=OuterRef('pk')).exclude(order__status='cancelled')
+        .values('product_id').annotate(total=Sum('quantity')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0025_review_likes_count_index'),
+        ('orders', '0004_cart_line'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sales_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد فروش'),
+        ),
+        migrations.RunPython(populate_sales_count, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,18 @@
 from datetime import time
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from accounts.models import Vendor
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 from django.urls import reverse
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from mptt.models import MPTTModel, TreeForeignKey
 from ckeditor_uploader.fields import RichTextUploadingField
+from .utils import build_search_title
 
 
 class Category(MPTTModel):
@@ -35,6 +40,9 @@ class Category(MPTTModel):
         help_text="اگر این تیک را بزنید، تمام محصولات موجود در زیرمجموعه‌های این دسته می‌توانند با هم مقایسه شوند. (مثلاً برای دسته 'موبایل' تیک بزنید تا سامسونگ و اپل مقایسه شوند)"
     )
 
+    # مسیر کامل ذخیره‌شده (الکترونیک > موبایل) تا نمایش متنی دسته بدون پیمایش والدها باشد
+    full_path = models.CharField(max_length=1000, blank=True, editable=False, verbose_name='مسیر کامل')
+
     class MPTTMeta:
         order_insertion_by = ['name']
 
@@ -42,14 +50,34 @@ class Category(MPTTModel):
         verbose_name = 'دسته‌بندی'
         verbose_name_plural = 'دسته‌بندی‌ها'
 
+    def save(self, *args, **kwargs):
+        previous_path = self.full_path
+        self.full_path = self.build_full_path()
+        super().save(*args, **kwargs)
+
+        # تغییر نام یا جابجایی دسته (move_node در ادمین درختی هم save را صدا می‌زند)
+        # مسیر همه زیرمجموعه‌ها را هم عوض می‌کند
+        if previous_path and previous_path != self.full_path:
+            self.update_descendant_paths()
+
+    def build_full_path(self):
+        if self.parent_id is None:
+            return self.name
+        parent_path = Category.objects.filter(pk=self.parent_id).values_list('full_path', flat=True).first()
+        return f'{parent_path} > {self.name}'
+
+    def update_descendant_paths(self):
+        """بازسازی مسیر زیرمجموعه‌ها (به ترتیب درخت، پس مسیر والد همیشه از قبل آماده است)"""
+        paths = {self.id: self.full_path}
+        descendants = list(self.get_descendants().only('id', 'parent_id', 'name'))
+        for category in descendants:
+            category.full_path = f'{paths[category.parent_id]} > {category.name}'
+            paths[category.id] = category.full_path
+        Category.objects.bulk_update(descendants, ['full_path'], batch_size=500)
+
     def __str__(self):
         # نمایش به صورت مسیر کامل: الکترونیک > موبایل
-        full_path = [self.name]
-        k = self.parent
-        while k is not None:
-            full_path.append(k.name)
-            k = k.parent
-        return ' > '.join(full_path[::-1])
+        return self.full_path or self.name
 
 
 class Brand(models.Model):
@@ -65,7 +93,71 @@ class Brand(models.Model):
         return self.name
 
 
-class Product(models.Model):
+class CounterFieldsMixin(models.Model):
+    """
+    فیلدهای COUNTER_FIELDS فقط با F-expression تغییر می‌کنند؛
+    ذخیره کامل شیء نباید مقدار قدیمی حافظه را رویشان بنویسد.
+    """
+    COUNTER_FIELDS = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # فقط وقتی فراخواننده update_fields نداده؛ فیلدهای defer/only شده هم نوشته نمی‌شوند
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            deferred_fields = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+# معادل post_save برای update گروهی محصولات
+# آرگومان‌ها: product_ids ، previous_category_ids (دسته‌ها قبل از update) و fields (فیلدهای تغییرکرده)
+products_updated = Signal()
+
+
+class ProductQuerySet(models.QuerySet):
+    # فیلدهایی که ایندکس فیلترهای سایدبار (ProductFacet / ProductNumericSpec) به آن‌ها وابسته است
+    FACET_FIELDS = frozenset({'status', 'category', 'category_id', 'specifications'})
+    # فیلدهای ایندکس جستجو که خودشان با update نوشته می‌شوند
+    SEARCH_INDEX_FIELDS = frozenset({'search_title', 'search_vector'})
+
+    def update(self, **kwargs):
+        """
+        update گروهی (مثل اکشن‌های ادمین) save و سیگنال post_save را صدا نمی‌زند؛
+        مثل save فیلد updated_at (کلید کش کارت محصول) بروز می‌شود و سیگنال products_updated
+        ایندکس‌ها و کش‌های وابسته به همان محصولات را بروز می‌کند.
+        update شمارنده‌ها و ایندکس جستجو (که خودشان از همین مسیر نوشته می‌شوند) مستقیم اجرا می‌شود.
+        """
+        if self.SEARCH_INDEX_FIELDS.union(self.model.COUNTER_FIELDS).issuperset(kwargs):
+            return super().update(**kwargs)
+
+        kwargs.setdefault('updated_at', timezone.now())
+        with transaction.atomic(using=self.db):
+            previous_rows = list(self.values_list('pk', 'category_id'))
+            rows = super().update(**kwargs)
+            if previous_rows:
+                products_updated.send(
+                    sender=self.model,
+                    product_ids=[pk for pk, category_id in previous_rows],
+                    previous_category_ids={category_id for pk, category_id in previous_rows},
+                    fields=frozenset(kwargs),
+                )
+        return rows
+
+
+class Product(CounterFieldsMixin, models.Model):
+    # فیلدهای شمارنده که خارج از save و به صورت اتمیک بروز می‌شوند
+    COUNTER_FIELDS = (
+        'rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+        'wishlist_count', 'sales_count',
+    )
+
     class Status(models.TextChoices):
         DRAFT = 'draft', 'پیش نویس'
         REVIEW = 'review', 'در حال بررسی'
@@ -125,6 +217,24 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # آمار امتیازها (در سیگنال‌های Review به صورت اتمیک بروز می‌شوند)
+    rating_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد امتیازها')
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name='مجموع امتیازها')
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    # تعداد علاقه‌مندی‌ها (بافر شمارنده‌ها در products/counters.py)؛ ایندکس برای مرتب‌سازی ادمین
+    wishlist_count = models.PositiveIntegerField(default=0, editable=False, db_index=True, verbose_name='تعداد علاقه‌مندی')
+    # تعداد فروخته‌شده در سفارش‌های لغونشده (برای رتبه‌بندی پیشنهادهای جستجو)
+    sales_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد فروش')
+
+    # فیلدهای جستجو (متن نرمال‌شده فارسی)؛ در save و سیگنال‌ها پر می‌شوند
+    search_title = models.CharField(max_length=500, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     wishlist = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         related_name='wishlist',
@@ -132,10 +242,22 @@ class Product(models.Model):
         verbose_name=_('Wishlist')
     )
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'محصول'
         verbose_name_plural = 'محصولات'
         ordering = ['-created_at']
+        indexes = [
+            # ایندکس‌های صفحه‌بندی کرسری لیست محصولات (مرتب‌سازی جدیدترین / قیمت)
+            models.Index(fields=['status', '-created_at', '-id'], name='products_status_created_idx'),
+            models.Index(fields=['status', 'price', 'id'], name='products_status_price_idx'),
+            # فیلترهای spec_* به صورت containment (@>) روی این ایندکس اجرا می‌شوند
+            GinIndex(fields=['specifications'], opclasses=['jsonb_path_ops'], name='products_specs_gin'),
+            # جستجوی متنی: tsvector (وزن‌دار) و trigram روی عنوان نرمال‌شده
+            GinIndex(fields=['search_vector'], name='products_search_vector_gin'),
+            GinIndex(fields=['search_title'], opclasses=['gin_trgm_ops'], name='products_search_title_trgm'),
+        ]
 
 
     def save(self, *args, **kwargs):
@@ -161,6 +283,7 @@ class Product(models.Model):
 
         # اتصال تکه‌ها به هم
         self.name = " ".join(full_name_parts)
+        self.search_title = build_search_title(self)
 
         # ساخت خودکار اسلاگ اگر خالی بود یا نام تغییر کرده بود
         if not self.slug:
@@ -180,6 +303,23 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('products:product_detail', args=[self.slug])
 
+    @property
+    def average_rating(self):
+        """میانگین امتیاز (یک رقم اعشار) از آمار ذخیره‌شده"""
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 1)
+
+    @property
+    def rating_histogram(self):
+        """توزیع امتیازها از ۵ ستاره تا ۱ ستاره همراه با درصد"""
+        histogram = []
+        for score in range(5, 0, -1):
+            count = getattr(self, f'rating_{score}')
+            percent = int(count * 100 / self.rating_count) if self.rating_count else 0
+            histogram.append({'score': score, 'count': count, 'percent': percent})
+        return histogram
+
     @property
     def discount_percent(self):
         """محاسبه درصد تخفیف"""
@@ -205,7 +345,9 @@ class ProductImage(models.Model):
         return f"Image for {self.product.name}"
 
 
-class Review(models.Model):
+class Review(CounterFieldsMixin, models.Model):
+    COUNTER_FIELDS = ('likes_count', 'dislikes_count')
+
     class Recommendation(models.TextChoices):
         RECOMMENDED = 'recommended', _('I suggest this product')
         NOT_RECOMMENDED = 'not_recommended', _('I do not suggest this product')
@@ -225,14 +367,21 @@ class Review(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
-    # لایک و دیس‌لایک
-    likes = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='liked_reviews', blank=True)
-    dislikes = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='disliked_reviews', blank=True)
+    # تعداد لایک و دیس‌لایک (رأی‌ها در ReviewVote)
+    likes_count = models.PositiveIntegerField(default=0, editable=False, db_index=True, verbose_name='تعداد لایک')
+    dislikes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد دیس‌لایک')
 
     class Meta:
         verbose_name = 'دیدگاه'
         verbose_name_plural = 'دیدگاه‌ها'
         ordering = ['-created_at']
+        indexes = [
+            # صفحه‌بندی کرسری نظرات هر محصول برای هر ترتیب قابل انتخاب
+            models.Index(fields=['product', '-created_at', '-id'], name='reviews_product_newest_idx'),
+            models.Index(fields=['product', '-likes_count', '-created_at', '-id'], name='reviews_product_helpful_idx'),
+            models.Index(fields=['product', '-score', '-created_at', '-id'], name='reviews_product_highest_idx'),
+            models.Index(fields=['product', 'score', '-created_at', '-id'], name='reviews_product_lowest_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} on {self.product}"
@@ -241,6 +390,39 @@ class Review(models.Model):
     def is_buyer(self):
         return True
 
+    # رأی کاربر جاری؛ برای همه نظرات صفحه با attach_user_votes یک‌جا مقداردهی می‌شود
+    user_vote = None
+
+    @property
+    def liked_by_user(self):
+        return self.user_vote == ReviewVote.Value.LIKE
+
+    @property
+    def disliked_by_user(self):
+        return self.user_vote == ReviewVote.Value.DISLIKE
+
+
+class ReviewVote(models.Model):
+    """رأی (لایک/دیس‌لایک) هر کاربر به یک نظر؛ هر کاربر حداکثر یک رأی"""
+    class Value(models.IntegerChoices):
+        LIKE = 1, 'لایک'
+        DISLIKE = -1, 'دیس‌لایک'
+
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='votes')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='review_votes')
+    value = models.SmallIntegerField(choices=Value.choices, verbose_name='رأی')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'رأی نظر'
+        verbose_name_plural = 'رأی‌های نظرات'
+        constraints = [
+            models.UniqueConstraint(fields=['review', 'user'], name='unique_review_vote_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.get_value_display()} {self.review_id}"
+
 
 class AttributeGroup(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='attribute_groups',
@@ -258,6 +440,10 @@ class AttributeGroup(models.Model):
 
 
 class ProductAttribute(models.Model):
+    class ValueType(models.TextChoices):
+        TEXT = 'text', 'متنی'
+        NUMBER = 'number', 'عددی'
+
     group = models.ForeignKey(AttributeGroup, on_delete=models.CASCADE, related_name='attributes',
                               verbose_name='گروه والد')
 
@@ -276,6 +462,15 @@ class ProductAttribute(models.Model):
 
     label = models.CharField(max_length=50, verbose_name='عنوان نمایشی (فارسی)', help_text="مثال: حافظه رم")
 
+    value_type = models.CharField(
+        max_length=10,
+        choices=ValueType.choices,
+        default=ValueType.TEXT,
+        verbose_name='نوع مقدار',
+        help_text="برای ویژگی‌های عددی (رم، اندازه صفحه، باتری) فیلتر بازه‌ای نمایش داده می‌شود"
+    )
+    unit = models.CharField(max_length=20, blank=True, verbose_name='واحد', help_text="مثال: GB، اینچ، mAh")
+
     is_filterable = models.BooleanField(default=False, verbose_name='استفاده به عنوان فیلتر')
     is_main = models.BooleanField(default=False, verbose_name='نمایش در ویژگی‌های اصلی')
 
@@ -291,6 +486,31 @@ class ProductAttribute(models.Model):
 
 
 
+class ProductNumericSpec(models.Model):
+    """
+    مقدار عددی پارس‌شده ویژگی‌های عددی هر محصول
+    برای فیلتر بازه‌ای (مثلاً رم ≥ 8) با اسکن ایندکس‌دار
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='numeric_specs', verbose_name='محصول')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='numeric_specs', verbose_name='دسته‌بندی')
+    key = models.CharField(max_length=50, verbose_name='کلید ویژگی')
+    value = models.DecimalField(max_digits=14, decimal_places=4, verbose_name='مقدار عددی')
+
+    class Meta:
+        verbose_name = 'مقدار عددی ویژگی'
+        verbose_name_plural = 'مقادیر عددی ویژگی‌ها'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'key'], name='unique_numeric_spec_per_product'),
+        ]
+        indexes = [
+            models.Index(fields=['key', 'value'], name='products_numspec_key_val'),
+            models.Index(fields=['category', 'key', 'value'], name='products_numspec_cat_key_val'),
+        ]
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+
 class MegaMenuColumn(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='menu_columns',
                                  verbose_name='نمایش در دسته')
@@ -323,4 +543,25 @@ class MegaMenuItem(models.Model):
         verbose_name_plural = 'آیتم‌های منو'
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+class ProductFacet(models.Model):
+    """
+    ایندکس فیلترهای سایدبار (Facet Index)
+    به ازای هر مقدار از ویژگی‌های هر محصول منتشرشده یک ردیف نگه می‌دارد تا
+    لیست مقادیر و تعداد محصولات هر مقدار با یک کوئری ایندکس‌دار خوانده شود.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='facets', verbose_name='محصول')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facets', verbose_name='دسته‌بندی')
+    key = models.CharField(max_length=50, verbose_name='کلید ویژگی')
+    value = models.CharField(max_length=255, verbose_name='مقدار نرمال‌شده')
+
+    class Meta:
+        verbose_name = 'مقدار فیلتر'
+        verbose_name_plural = 'ایندکس فیلترها'
+        indexes = [
+            models.Index(fields=['category', 'key', 'value'], name='products_facet_cat_key_val'),
+        ]
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
@@ -0,0 +1,105 @@
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+CURSOR_PARAM = 'cursor'
+
+
+class KeysetPage:
+    """یک صفحه از نتایج صفحه‌بندی کرسری (Keyset)"""
+
+    def __init__(self, object_list, next_cursor, request):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.is_first = not request.GET.get(CURSOR_PARAM)
+        self._request = request
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def next_query(self):
+        """کوئری‌استرینگ صفحه بعد (همه فیلترهای فعلی + کرسر جدید)"""
+        params = self._request.GET.copy()
+        params[CURSOR_PARAM] = self.next_cursor
+        return params.urlencode()
+
+
+def _field_name(order_field):
+    return order_field.lstrip('-')
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(queryset, ordering, cursor):
+    """
+    تبدیل کرسر به مقادیر پایتونی فیلدهای مرتب‌سازی
+    کرسر نامعتبر None برمی‌گرداند (یعنی نمایش از صفحه اول)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+
+    if not isinstance(values, list) or len(values) != len(ordering):
+        return None
+
+    parsed = []
+    for order_field, value in zip(ordering, values):
+        try:
+            field = queryset.model._meta.get_field(_field_name(order_field))
+            parsed.append(field.to_python(value))
+        except FieldDoesNotExist:
+            # فیلدهای annotate شده (مثل امتیاز جستجو) همان مقدار خام JSON هستند
+            parsed.append(value)
+        except ValidationError:
+            return None
+    return parsed
+
+
+def keyset_filter(ordering, values):
+    """
+    ساخت شرط «بعد از ردیف آخر» برای ترتیب چندستونی
+    مثال برای (-created_at, -id):
+    created_at < X  یا  (created_at = X و id < Y)
+    """
+    condition = Q()
+    for i, order_field in enumerate(ordering):
+        name = _field_name(order_field)
+        lookup = 'lt' if order_field.startswith('-') else 'gt'
+        branch = Q(**{f'{name}__{lookup}': values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            branch &= Q(**{_field_name(prev_field): prev_value})
+        condition |= branch
+    return condition
+
+
+def paginate_keyset(queryset, ordering, request, per_page=24):
+    """
+    صفحه‌بندی کرسری: به جای OFFSET، از آخرین ردیف صفحه قبل ادامه می‌دهد
+    تا هزینه هر صفحه مستقل از عمق و اندازه نتایج باشد.
+    ترتیب باید به یک فیلد یکتا (مثل id) ختم شود و فیلدها نباید NULL باشند.
+    """
+    ordering = tuple(ordering)
+    queryset = queryset.order_by(*ordering)
+
+    cursor = request.GET.get(CURSOR_PARAM)
+    if cursor:
+        values = decode_cursor(queryset, ordering, cursor)
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(ordering, values))
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, _field_name(f)) for f in ordering])
+
+    return KeysetPage(rows, next_cursor, request)
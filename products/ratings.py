@@ -0,0 +1,40 @@
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import Product, Review
+
+RATING_SCORES = range(1, 6)
+
+
+def change_rating(product_id, score, delta):
+    """
+    افزودن (delta=1) یا کم کردن (delta=-1) یک امتیاز از آمار محصول
+    بروزرسانی با F-expression انجام می‌شود تا ثبت همزمان چند نظر همدیگر را خنثی نکنند.
+    """
+    if score not in RATING_SCORES:
+        return
+    field = f'rating_{score}'
+    Product.objects.filter(pk=product_id).update(**{
+        'rating_count': F('rating_count') + delta,
+        'rating_sum': F('rating_sum') + delta * score,
+        field: F(field) + delta,
+    })
+
+
+def _review_aggregate(aggregate, **filters):
+    return Coalesce(Subquery(
+        Review.objects.filter(product_id=OuterRef('pk'), score__in=RATING_SCORES, **filters)
+        .values('product_id').annotate(value=aggregate).values('value')
+    ), 0)
+
+
+def rebuild_ratings():
+    """
+    محاسبه مجدد آمار امتیاز همه محصولات از روی جدول نظرات (برای دستور مدیریتی)
+    صفر کردن و محاسبه در یک UPDATE انجام می‌شود، پس نظری که همزمان ثبت می‌شود
+    بین این دو مرحله گم نمی‌شود. خروجی: تعداد محصولات
+    """
+    return Product.objects.update(
+        rating_count=_review_aggregate(Count('*')),
+        rating_sum=_review_aggregate(Sum('score')),
+        **{f'rating_{score}': _review_aggregate(Count('*'), score=score) for score in RATING_SCORES},
+    )
@@ -0,0 +1,53 @@
+import random
+from django.conf import settings
+from django.core.cache import cache
+from .models import Product
+
+# مدت اعتبار لیست کاندیدهای هر دسته (بازسازی دوره‌ای)
+RELATED_POOL_TIMEOUT = getattr(settings, 'RELATED_PRODUCTS_POOL_TIMEOUT', 60 * 60)
+
+
+def _pool_key(category_id):
+    return f'related_products:{category_id}'
+
+
+def get_candidate_ids(category_id):
+    """
+    شناسه همه محصولات منتشرشده و موجود یک دسته
+    لیست در کش نگه داشته می‌شود تا هر بازدید صفحه محصول کل دسته را نخواند و مرتب نکند؛
+    نمونه‌گیری از کل لیست است، پس محصولات قدیمی دسته هم شانس نمایش دارند.
+    """
+    key = _pool_key(category_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(Product.objects.filter(
+            category_id=category_id,
+            status=Product.Status.PUBLISHED,
+            is_available=True,
+            stock__gt=0,
+        ).order_by().values_list('id', flat=True))
+        cache.set(key, ids, RELATED_POOL_TIMEOUT)
+    return ids
+
+
+def invalidate_related_pool(*category_ids):
+    cache.delete_many([_pool_key(category_id) for category_id in set(category_ids) if category_id])
+
+
+def get_related_products(product, limit=10):
+    """
+    نمونه تصادفی از کاندیدهای هم‌دسته (بدون ORDER BY random روی کل دسته)
+    وضعیت محصولات نمونه دوباره چک می‌شود تا کاندیدی که تازه ناموجود شده نمایش داده نشود.
+    """
+    ids = [pk for pk in get_candidate_ids(product.category_id) if pk != product.id]
+    sample = random.sample(ids, min(len(ids), limit))
+    if not sample:
+        return []
+
+    products = Product.objects.filter(
+        id__in=sample,
+        status=Product.Status.PUBLISHED,
+        is_available=True,
+        stock__gt=0,
+    ).in_bulk()
+    return [products[pk] for pk in sample if pk in products]
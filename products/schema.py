@@ -0,0 +1,103 @@
+from collections import namedtuple
+from django.core.cache import cache
+from core.utils import get_cache_version
+from .models import AttributeGroup
+from .category_tree import get_category_tree
+
+CACHE_VERSION_NAME = 'category_schema'
+SCHEMA_TIMEOUT = 60 * 60 * 24
+
+SchemaAttribute = namedtuple('SchemaAttribute', ['key', 'label', 'value_type', 'unit', 'is_main', 'is_filterable'])
+SchemaGroup = namedtuple('SchemaGroup', ['name', 'attributes'])
+
+
+class CategorySchema:
+    """
+    ساختار کامپایل‌شده ویژگی‌های یک دسته (گروه‌ها و ویژگی‌های خود دسته و اجدادش به ترتیب نمایش)
+    متدهای نمایش، مشخصات محصول را بدون دسترسی به دیتابیس و در یک گذر به ساختار قالب‌ها تبدیل می‌کنند.
+    """
+
+    def __init__(self, groups):
+        self.groups = groups
+        self.attributes = [attr for group in groups for attr in group.attributes]
+        self.main_attributes = [attr for attr in self.attributes if attr.is_main]
+        self.filterable_attributes = [attr for attr in self.attributes if attr.is_filterable]
+        self.keys = {attr.key for attr in self.attributes}
+
+    def specs_display(self, specifications):
+        """جدول مشخصات فنی صفحه محصول: [{'name', 'items': [{'label', 'value'}]}]"""
+        specifications = specifications or {}
+        display = []
+        for group in self.groups:
+            items = [
+                {'label': attr.label, 'value': specifications[attr.key]}
+                for attr in group.attributes if specifications.get(attr.key)
+            ]
+            if items:
+                display.append({'name': group.name, 'items': items})
+        return display
+
+    def summary_specs(self, specifications, limit=6):
+        """ویژگی‌های اصلی کنار تصویر محصول"""
+        specifications = specifications or {}
+        summary = [
+            {'label': attr.label, 'value': specifications[attr.key]}
+            for attr in self.main_attributes if specifications.get(attr.key)
+        ]
+        return summary[:limit]
+
+    def comparison_rows(self, products):
+        """
+        ردیف‌های جدول مقایسه: [{'group_name', 'attributes': [{'label', 'values'}]}]
+        ویژگی‌ای که هیچ‌کدام از محصولات مقدار ندارد حذف می‌شود.
+        """
+        rows = []
+        for group in self.groups:
+            group_rows = []
+            for attr in group.attributes:
+                values = [(product.specifications or {}).get(attr.key, '-') for product in products]
+                if any(value != '-' for value in values):
+                    group_rows.append({'label': attr.label, 'values': values})
+            if group_rows:
+                rows.append({'group_name': group.name, 'attributes': group_rows})
+        return rows
+
+    def as_api(self):
+        """خروجی API پنل ادمین (گروه‌ها و کلید/عنوان ویژگی‌ها)"""
+        return [
+            {
+                'group_name': group.name,
+                'attributes': [{'key': attr.key, 'label': attr.label} for attr in group.attributes],
+            }
+            for group in self.groups if group.attributes
+        ]
+
+
+def build_schema(category_id):
+    tree = get_category_tree()
+    family = tree.ancestor_ids(category_id)
+    groups = AttributeGroup.objects.filter(category_id__in=family).prefetch_related('attributes')
+
+    # ترتیب: گروه‌های دسته بالاتر اول، سپس ترتیب خود گروه
+    levels = {pk: level for level, pk in enumerate(family)}
+    groups = sorted(groups, key=lambda group: (levels[group.category_id], group.order, group.id))
+    return CategorySchema([
+        SchemaGroup(group.name, tuple(
+            SchemaAttribute(attr.key, attr.label, attr.value_type, attr.unit, attr.is_main, attr.is_filterable)
+            for attr in group.attributes.all()
+        ))
+        for group in groups
+    ])
+
+
+def get_category_schema(category_id):
+    """
+    ساختار ویژگی‌های دسته از کش
+    با ذخیره/حذف گروه ویژگی، ویژگی یا دسته، نسخه کش عوض می‌شود.
+    """
+    cache_key = f'category_schema:{get_cache_version(CACHE_VERSION_NAME)}:{category_id}'
+    schema = cache.get(cache_key)
+    if schema is None:
+        schema = build_schema(category_id)
+        cache.set(cache_key, schema, SCHEMA_TIMEOUT)
+    return schema
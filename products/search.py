@@ -0,0 +1,81 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+from .models import Product
+from .utils import normalize_persian, build_search_title, build_search_body
+
+# پیکربندی simple: بدون stemming انگلیسی، مناسب متن فارسی نرمال‌شده
+SEARCH_CONFIG = 'simple'
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def build_search_vector(product):
+    """
+    ساخت tsvector وزن‌دار محصول
+    A: نام کامل ، B: برند و مدل ، C: توضیحات
+    """
+    brand_and_model = normalize_persian(' '.join(filter(None, [
+        product.brand.name if product.brand else '',
+        product.model_name,
+    ])))
+    return (
+        SearchVector(Value(normalize_persian(product.name)), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(brand_and_model), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Value(build_search_body(product)), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_index(product):
+    """بروزرسانی فیلدهای جستجوی یک محصول (بدون فراخوانی دوباره save)"""
+    Product.objects.filter(pk=product.pk).update(
+        search_title=build_search_title(product),
+        search_vector=build_search_vector(product),
+    )
+
+
+def update_search_indexes(products):
+    """بروزرسانی فیلدهای جستجوی چند محصول (مثلاً بعد از update گروهی)"""
+    products = products.select_related('brand').only(
+        'id', 'name', 'model_name', 'description', 'brand__name'
+    )
+    for product in products.iterator(chunk_size=500):
+        update_search_index(product)
+
+
+def rebuild_search_index():
+    update_search_indexes(Product.objects.all())
+
+
+def build_prefix_query(normalized_query):
+    """
+    تبدیل عبارت کاربر به tsquery پیشوندی: "گوشی سام" -> 'گوشی:* & سام:*'
+    تا نتایج با هر کلید تایپ‌شده (قبل از کامل شدن کلمه) پیدا شوند.
+    """
+    tokens = TOKEN_PATTERN.findall(normalized_query)
+    if not tokens:
+        return None
+    return SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_products(products, query):
+    """
+    فیلتر و رتبه‌بندی محصولات بر اساس عبارت جستجو
+    تطبیق با tsvector (پیشوندی) یا شباهت trigram عنوان (برای غلط‌های تایپی)،
+    خروجی با فیلد rank حاشیه‌نویسی می‌شود.
+    """
+    normalized_query = normalize_persian(query)
+    ts_query = build_prefix_query(normalized_query)
+    if ts_query is None:
+        return products.none()
+
+    return products.filter(
+        Q(search_vector=ts_query) | Q(search_title__trigram_word_similar=normalized_query)
+    ).annotate(
+        # ts_rank از نوع real است؛ تبدیل به double تا مقدار کرسر صفحه‌بندی دقیقاً برابر بماند
+        rank=Cast(
+            SearchRank(F('search_vector'), ts_query) + TrigramWordSimilarity(normalized_query, 'search_title'),
+            output_field=FloatField(),
+        )
+    )
@@ -0,0 +1,219 @@
+from django.core.signals import request_started
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Product, ProductAttribute, ProductNumericSpec, Category, MegaMenuColumn, MegaMenuItem, Review, \
+    AttributeGroup, ProductQuerySet, products_updated
+from .facets import sync_product_facets, sync_products_facets, sync_numeric_attribute, clear_numeric_attribute
+from .search import update_search_index, update_search_indexes
+from . import autocomplete
+from .ratings import change_rating
+from .related import invalidate_related_pool
+from .wishlist import invalidate_wishlist
+from .counters import increment as increment_counter
+from .context_processors import MEGA_MENU_CACHE_VERSION
+from .category_tree import CACHE_VERSION_NAME as CATEGORY_TREE_CACHE_VERSION
+from .schema import CACHE_VERSION_NAME as CATEGORY_SCHEMA_CACHE_VERSION
+from core.utils import bump_cache_version
+
+
+@receiver(post_save, sender=Product)
+def update_product_facets(sender, instance, **kwargs):
+    # با هر ذخیره (تغییر مشخصات، دسته یا وضعیت انتشار) ایندکس فیلترها بروز می‌شود
+    # حذف محصول به صورت CASCADE ردیف‌های ایندکس را هم پاک می‌کند
+    sync_product_facets(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, **kwargs):
+    update_search_index(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_autocomplete_product(sender, instance, **kwargs):
+    autocomplete.update_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_autocomplete_product(sender, instance, **kwargs):
+    autocomplete.remove_product(instance.id)
+
+
+@receiver(request_started, dispatch_uid='autocomplete_warm_up')
+def warm_up_autocomplete(sender, **kwargs):
+    # ساخت ایندکس پیشنهاد جستجو در پس‌زمینه با اولین درخواست هر پروسه (نه هنگام import برنامه)
+    request_started.disconnect(dispatch_uid='autocomplete_warm_up')
+    autocomplete.start_build()
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    instance._previous_category_id = None
+    if instance.pk:
+        instance._previous_category_id = Product.objects.filter(pk=instance.pk).values_list(
+            'category_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Product)
+def refresh_related_products(sender, instance, **kwargs):
+    # انتشار، ناموجود شدن یا حذف محصول لیست کاندیدهای محصولات مرتبط دسته را باطل می‌کند؛
+    # با تغییر دسته، محصول از لیست دسته قبلی هم باید حذف شود
+    invalidate_related_pool(instance.category_id, getattr(instance, '_previous_category_id', None))
+
+
+# --- update گروهی محصولات (QuerySet.update) ---
+
+# فیلدهایی که در متن ایندکس جستجو و پیشنهادهای هدر استفاده می‌شوند
+SEARCH_SOURCE_FIELDS = frozenset({'name', 'model_name', 'description', 'brand', 'brand_id'})
+
+
+@receiver(products_updated, sender=Product)
+def update_bulk_product_facets(sender, product_ids, fields, **kwargs):
+    if not ProductQuerySet.FACET_FIELDS.isdisjoint(fields):
+        sync_products_facets(product_ids)
+
+
+@receiver(products_updated, sender=Product)
+def update_bulk_product_search_index(sender, product_ids, fields, **kwargs):
+    if not SEARCH_SOURCE_FIELDS.isdisjoint(fields):
+        update_search_indexes(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(products_updated, sender=Product)
+def update_bulk_autocomplete_products(sender, product_ids, **kwargs):
+    # payload پیشنهادها قیمت و موجودی را هم دارد
+    autocomplete.update_products(product_ids)
+
+
+@receiver(products_updated, sender=Product)
+def refresh_bulk_related_products(sender, product_ids, previous_category_ids, **kwargs):
+    category_ids = set(Product.objects.filter(pk__in=product_ids).values_list('category_id', flat=True))
+    invalidate_related_pool(*(category_ids | previous_category_ids))
+
+
+@receiver(post_save, sender=Category)
+def update_autocomplete_category(sender, instance, **kwargs):
+    autocomplete.update_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def remove_autocomplete_category(sender, instance, **kwargs):
+    autocomplete.remove_category(instance.id)
+
+
+@receiver(pre_save, sender=ProductAttribute)
+def remember_attribute_state(sender, instance, **kwargs):
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = ProductAttribute.objects.filter(pk=instance.pk).values('key', 'value_type').first()
+
+
+@receiver(post_save, sender=ProductAttribute)
+def update_numeric_specs(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_state', None) or {}
+    was_numeric = previous.get('value_type') == ProductAttribute.ValueType.NUMBER
+    is_numeric = instance.value_type == ProductAttribute.ValueType.NUMBER
+    if not (was_numeric or is_numeric):
+        return
+
+    # اگر کلید ویژگی عوض شده، مقادیر کلید قبلی پاک می‌شوند
+    if was_numeric and previous['key'] != instance.key:
+        clear_numeric_attribute(instance, previous['key'])
+    sync_numeric_attribute(instance)
+
+
+@receiver(post_delete, sender=ProductAttribute)
+def delete_numeric_specs(sender, instance, **kwargs):
+    # ممکن است گروه و دسته هم همزمان حذف شده باشند، پس فقط بر اساس کلید پاک می‌کنیم
+    still_numeric = ProductAttribute.objects.filter(
+        key=instance.key,
+        value_type=ProductAttribute.ValueType.NUMBER,
+    ).exists()
+    if not still_numeric:
+        ProductNumericSpec.objects.filter(key=instance.key).delete()
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=MegaMenuColumn)
+@receiver([post_save, post_delete], sender=MegaMenuItem)
+def invalidate_mega_menu(sender, **kwargs):
+    bump_cache_version(MEGA_MENU_CACHE_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    # جابجایی گره در ادمین درختی lft/rght چند دسته را عوض می‌کند؛ اسنپ‌شات درخت باید از نو ساخته شود
+    bump_cache_version(CATEGORY_TREE_CACHE_VERSION)
+
+
+@receiver([post_save, post_delete], sender=AttributeGroup)
+@receiver([post_save, post_delete], sender=ProductAttribute)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_schema(sender, **kwargs):
+    # ساختار ویژگی‌ها به گروه‌های دسته و اجدادش وابسته است
+    bump_cache_version(CATEGORY_SCHEMA_CACHE_VERSION)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_score(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values('product_id', 'score').first()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if previous and (previous['product_id'], previous['score']) == (instance.product_id, instance.score):
+        return
+    if previous:
+        change_rating(previous['product_id'], previous['score'], -1)
+    change_rating(instance.product_id, instance.score, 1)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    change_rating(instance.product_id, instance.score, -1)
+
+
+@receiver(m2m_changed, sender=Product.wishlist.through)
+def invalidate_wishlist_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    # از سمت کاربر (user.wishlist) instance خود کاربر است و از سمت محصول pk_set شناسه کاربران
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = list(instance.wishlist.values_list('id', flat=True))
+    else:
+        user_ids = pk_set or []
+    if action in ('post_add', 'post_remove', 'pre_clear') and user_ids:
+        invalidate_wishlist(user_ids)
+
+
+def _counter_changes(instance, action, reverse, pk_set, forward_name, reverse_name):
+    """
+    تغییر شمارنده اشیاء سمت اصلی یک رابطه M2M: {pk: delta}
+    از سمت اصلی instance خود شیء است و از سمت معکوس (کاربر) pk_set شناسه اشیاء.
+    حذف قبل از اجرا شمرده می‌شود، چون pk_set در remove شامل شناسه‌های غیرمرتبط هم می‌شود.
+    """
+    if action == 'post_add' and pk_set:
+        if reverse:
+            return {pk: 1 for pk in pk_set}
+        return {instance.pk: len(pk_set)}
+    if action in ('pre_remove', 'pre_clear'):
+        if reverse:
+            related = getattr(instance, reverse_name).all()
+            if action == 'pre_remove':
+                related = related.filter(pk__in=pk_set)
+            return {pk: -1 for pk in related.values_list('id', flat=True)}
+        related = getattr(instance, forward_name).all()
+        if action == 'pre_remove':
+            related = related.filter(pk__in=pk_set)
+        return {instance.pk: -related.count()}
+    return {}
+
+
+@receiver(m2m_changed, sender=Product.wishlist.through)
+def count_wishlist(sender, instance, action, reverse, pk_set, **kwargs):
+    changes = _counter_changes(instance, action, reverse, pk_set, 'wishlist', 'wishlist')
+    for pk, delta in changes.items():
+        increment_counter(Product, 'wishlist_count', pk, delta)
+
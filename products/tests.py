@@ -1,3 +1,437 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from accounts.models import User, Vendor
+from core.home import CACHE_VERSION_NAME as HOME_SNAPSHOT_CACHE_VERSION
+from core.utils import get_cache_version
+
+from . import autocomplete
+from .counters import increment, with_pending
+from .filters import spec_containment_q
+from .pagination import CURSOR_PARAM, paginate_keyset
+from .facets import get_facet_sidebar
+from .models import (
+    AttributeGroup, Category, Product, ProductAttribute, ProductFacet, ProductNumericSpec, Review, ReviewVote,
+)
+from .ratings import rebuild_ratings
+from .related import get_candidate_ids, get_related_products
+from .wishlist import get_wishlist_ids
+
+
+def create_catalog(phone_number='09120000001', count=1, **fields):
+    """یک فروشنده، یک دسته و count محصول منتشرشده"""
+    user = User.objects.create_user(phone_number=phone_number)
+    vendor = Vendor.objects.create(user=user, store_name='فروشگاه تست', slug='test-store')
+    category = Category.objects.create(name='موبایل', slug='mobile')
+    products = [
+        Product.objects.create(
+            vendor=vendor,
+            category=category,
+            model_name=f'A{i}',
+            slug=f'test-a{i}',
+            image='products/covers/test.jpg',
+            price=fields.get('price', 1000 + i),
+            stock=5,
+            status=Product.Status.PUBLISHED,
+        )
+        for i in range(count)
+    ]
+    return user, category, products
+
+
+@skipUnless(connection.vendor == 'postgresql', 'GIN/jsonb فقط روی PostgreSQL')
+class SpecificationFilterIndexTests(TestCase):
+    def test_spec_filter_uses_gin_index(self):
+        # روی جدول کوچک تست، پلنر Seq Scan را ترجیح می‌دهد؛ آن را فقط برای همین تراکنش غیرفعال می‌کنیم
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        products = Product.objects.filter(spec_containment_q('ram', ['8GB', '12GB']))
+        products = products.filter(spec_containment_q('color', ['آبی']))
+        plan = products.explain()
+
+        self.assertIn('products_specs_gin', plan)
+        self.assertNotIn('Seq Scan on products_product', plan)
+
+
+class WishlistToggleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, (cls.product,) = create_catalog()
+
+    def test_toggle_uses_database_state_not_cached_ids(self):
+        self.client.force_login(self.user)
+        self.assertEqual(get_wishlist_ids(self.user), frozenset())
+        # تغییر بدون سیگنال m2m_changed: کش هنوز مجموعه خالی قدیمی را دارد
+        Product.wishlist.through.objects.create(product=self.product, user=self.user)
+
+        self.client.post(reverse('products:toggle_wishlist', args=[self.product.slug]))
+        self.assertFalse(self.product.wishlist.filter(id=self.user.id).exists())
+
+
+class NumericRangeFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, cls.products = create_catalog(count=3)
+        group = AttributeGroup.objects.create(category=cls.category, name='مشخصات کلی')
+        ProductAttribute.objects.create(
+            group=group, key='ram', label='رم', unit='GB',
+            value_type=ProductAttribute.ValueType.NUMBER, is_filterable=True,
+        )
+        for product, ram in zip(cls.products, ['۴ گیگابایت', '8GB', 'IMEI 356938035643809']):
+            product.specifications = {'ram': ram}
+            product.save()
+
+    def list_ids(self, **params):
+        response = self.client.get(reverse('products:product_list'), {'category': 'mobile', **params})
+        return {product.id for product in response.context['page'].object_list}
+
+    def test_out_of_range_number_is_not_indexed(self):
+        values = dict(ProductNumericSpec.objects.values_list('product_id', 'value'))
+        self.assertEqual(values, {self.products[0].id: 4, self.products[1].id: 8})
+
+    def test_range_filters(self):
+        first, second, _ = self.products
+        self.assertEqual(self.list_ids(min_ram='6'), {second.id})
+        self.assertEqual(self.list_ids(max_ram='۶'), {first.id})
+        self.assertEqual(self.list_ids(min_ram='4', max_ram='8'), {first.id, second.id})
+        # مقدار خارج از محدوده ستون نادیده گرفته می‌شود (نه خطای دیتابیس)
+        self.assertEqual(len(self.list_ids(min_ram='9' * 30)), 3)
+
+
+class CategoryPathTests(TestCase):
+    def test_moving_category_updates_descendant_paths(self):
+        electronics = Category.objects.create(name='الکترونیک', slug='electronics')
+        digital = Category.objects.create(name='دیجیتال', slug='digital')
+        mobile = Category.objects.create(name='موبایل', slug='mobile', parent=electronics)
+        samsung = Category.objects.create(name='سامسونگ', slug='samsung', parent=mobile)
+        self.assertEqual(samsung.full_path, 'الکترونیک > موبایل > سامسونگ')
+
+        # جابجایی درختی ادمین (move_node) از مسیر save همان دسته بروز می‌شود
+        Category.objects.move_node(mobile, digital)
+        samsung.refresh_from_db()
+        self.assertEqual(samsung.full_path, 'دیجیتال > موبایل > سامسونگ')
+
+
+class RatingCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, (cls.product, cls.other) = create_catalog(count=2)
+
+    def stats(self, product):
+        product.refresh_from_db()
+        return (product.rating_count, product.rating_sum, product.rating_4, product.rating_5)
+
+    def test_counters_follow_review_changes(self):
+        first = Review.objects.create(product=self.product, user=self.user, score=5, comment='عالی')
+        Review.objects.create(product=self.product, user=self.user, score=4, comment='خوب')
+        self.assertEqual(self.stats(self.product), (2, 9, 1, 1))
+
+        # تغییر امتیاز و جابجایی نظر به محصول دیگر
+        first.score = 4
+        first.save()
+        self.assertEqual(self.stats(self.product), (2, 8, 2, 0))
+        first.product = self.other
+        first.save()
+        self.assertEqual(self.stats(self.product), (1, 4, 1, 0))
+        self.assertEqual(self.stats(self.other), (1, 4, 1, 0))
+
+        first.delete()
+        self.assertEqual(self.stats(self.other), (0, 0, 0, 0))
+
+    def test_save_skips_deferred_fields(self):
+        product = Product.objects.defer('description').get(pk=self.product.pk)
+        product.stock = 3
+        product.save()
+        # فیلد defer شده برای نوشتن دوباره خوانده نمی‌شود
+        self.assertIn('description', product.get_deferred_fields())
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 3)
+
+    def test_rebuild_recomputes_from_reviews(self):
+        Review.objects.create(product=self.product, user=self.user, score=5, comment='عالی')
+        Product.objects.update(rating_count=7, rating_sum=30, rating_5=0)
+
+        self.assertEqual(rebuild_ratings(), 2)
+        self.assertEqual(self.stats(self.product), (1, 5, 0, 1))
+        self.assertEqual(self.stats(self.other), (0, 0, 0, 0))
+
+
+class RelatedProductsPoolTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, cls.products = create_catalog(count=3)
+
+    def test_pool_covers_category_and_follows_category_change(self):
+        self.assertCountEqual(get_candidate_ids(self.category.id), [product.id for product in self.products])
+
+        moved = self.products[0]
+        moved.category = Category.objects.create(name='لپ‌تاپ', slug='laptop')
+        moved.save()
+        self.assertNotIn(moved.id, get_candidate_ids(self.category.id))
+        self.assertEqual(get_candidate_ids(moved.category_id), [moved.id])
+
+    def test_sold_out_candidate_is_not_shown_from_stale_pool(self):
+        current, sold_out, available = self.products
+        get_candidate_ids(self.category.id)
+        Product.objects.filter(pk=sold_out.pk).update(stock=0)
+        self.assertEqual([p.id for p in get_related_products(current)], [available.id])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # قیمت‌های تکراری: ترتیب بین محصولات هم‌قیمت با id مشخص می‌شود
+        cls.user, cls.category, cls.products = create_catalog(count=7, price=1000)
+        Product.objects.filter(pk__in=[p.pk for p in cls.products[:3]]).update(price=500)
+
+    def walk(self, ordering, per_page=2):
+        factory = RequestFactory()
+        seen, params = [], {}
+        while True:
+            page = paginate_keyset(Product.objects.all(), ordering, factory.get('/', params), per_page=per_page)
+            seen.extend(product.id for product in page.object_list)
+            if not page.has_next:
+                return seen
+            params = {CURSOR_PARAM: page.next_cursor}
+
+    def test_pages_cover_all_rows_once_in_order(self):
+        for ordering in [('price', 'id'), ('-price', '-id'), ('-created_at', '-id')]:
+            with self.subTest(ordering=ordering):
+                expected = list(Product.objects.order_by(*ordering).values_list('id', flat=True))
+                self.assertEqual(self.walk(ordering), expected)
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        request = RequestFactory().get('/', {CURSOR_PARAM: 'not-a-cursor'})
+        page = paginate_keyset(Product.objects.all(), ('price', 'id'), request, per_page=2)
+        self.assertEqual([p.id for p in page.object_list], [p.id for p in self.products[:2]])
+
+
+class FacetIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, cls.products = create_catalog(count=3)
+        group = AttributeGroup.objects.create(category=cls.category, name='مشخصات کلی')
+        cls.attributes = [
+            ProductAttribute.objects.create(group=group, key=key, label=key, is_filterable=True)
+            for key in ['color', 'ram']
+        ]
+        specs = [{'color': 'آبی', 'ram': '8'}, {'color': 'قرمز', 'ram': '8'}, {'color': 'آبی', 'ram': '4'}]
+        for product, product_specs in zip(cls.products, specs):
+            product.specifications = product_specs
+            product.save()
+
+    def test_bulk_status_update_resyncs_facets(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(status=Product.Status.DRAFT)
+        self.assertFalse(ProductFacet.objects.filter(product=product).exists())
+        Product.objects.filter(pk=product.pk).update(status=Product.Status.PUBLISHED)
+        self.assertEqual(ProductFacet.objects.filter(product=product).count(), 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'فیلتر containment روی jsonb فقط در PostgreSQL')
+    def test_counts_ignore_the_keys_own_selection(self):
+        params = QueryDict(mutable=True)
+        params.setlist('spec_color', ['آبی'])
+        sidebar = get_facet_sidebar(self.attributes, [self.category.id], Product.objects.all(), params)
+        counts = {(item['key'], value['value']): value['count'] for item in sidebar for value in item['values']}
+        self.assertEqual(counts, {
+            # مقادیر دیگر همان ویژگی با بقیه فیلترها شمرده می‌شوند
+            ('color', 'آبی'): 2, ('color', 'قرمز'): 1,
+            # ویژگی‌های دیگر با فیلتر رنگ
+            ('ram', '4'): 1, ('ram', '8'): 1,
+        })
+
+
+@skipUnless(connection.vendor == 'postgresql', 'کوئری CTE با ON CONFLICT فقط روی PostgreSQL')
+# شمارنده‌ها مستقیم در دیتابیس (بدون بافر کش) تا مقدارشان در تست قطعی باشد
+@mock.patch('products.counters.is_shared_cache', return_value=False)
+class ReviewVoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, (cls.product,) = create_catalog()
+        cls.review = Review.objects.create(product=cls.product, user=cls.user, score=5, comment='عالی')
+
+    def vote(self, name):
+        # شمارنده‌ها بعد از commit تراکنش درخواست بروز می‌شوند
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(f'products:{name}_review', args=[self.review.id]))
+        self.review.refresh_from_db()
+        votes = list(ReviewVote.objects.filter(review=self.review).values_list('value', flat=True))
+        return self.review.likes_count, self.review.dislikes_count, votes
+
+    def test_toggle_and_switch_vote(self, _):
+        self.client.force_login(self.user)
+        self.assertEqual(self.vote('like'), (1, 0, [ReviewVote.Value.LIKE]))
+        # کلیک دوباره رأی را برمی‌دارد
+        self.assertEqual(self.vote('like'), (0, 0, []))
+        self.vote('like')
+        # تغییر رأی: یکی از لایک کم و یکی به دیسلایک اضافه می‌شود
+        self.assertEqual(self.vote('dislike'), (0, 1, [ReviewVote.Value.DISLIKE]))
+
+
+# بافر کش مشترک؛ flush خودکار در طول تست اتفاق نمی‌افتد
+@mock.patch('products.counters.is_shared_cache', return_value=True)
+@mock.patch('products.counters.FLUSH_INTERVAL', float('inf'))
+class CounterBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, (cls.product,) = create_catalog()
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_rolled_back_increment_is_not_buffered(self, _):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    increment(Product, 'wishlist_count', self.product.pk, 5)
+                    raise ValueError
+            except ValueError:
+                pass
+            increment(Product, 'wishlist_count', self.product.pk, 2)
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(with_pending([product], 'wishlist_count')[0].wishlist_count, 2)
+
+
+class ReviewListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, (cls.product,) = create_catalog()
+        cls.reviews = [
+            Review.objects.create(product=cls.product, user=cls.user, score=i % 5 + 1, comment=f'نظر {i}')
+            for i in range(12)
+        ]
+
+    def get_page(self, **params):
+        response = self.client.get(reverse('products:product_reviews', args=[self.product.slug]), params)
+        return response.context['page']
+
+    def test_pages_follow_cursor(self):
+        first = self.get_page()
+        self.assertEqual(len(first.object_list), 10)
+        self.assertTrue(first.has_next)
+
+        second = self.get_page(cursor=first.next_cursor)
+        self.assertFalse(second.has_next)
+        ids = [review.id for review in first.object_list + second.object_list]
+        self.assertEqual(ids, [review.id for review in reversed(self.reviews)])
+
+    def test_admin_lists_most_liked_first(self):
+        Review.objects.filter(pk=self.reviews[3].pk).update(likes_count=4)
+        self.client.force_login(User.objects.create_superuser(phone_number='09129999999'))
+        response = self.client.get(reverse('admin:products_review_changelist'))
+        self.assertEqual(response.context['cl'].result_list[0], self.reviews[3])
+
+    def test_sort_by_score(self):
+        page = self.get_page(sort='highest')
+        scores = [review.score for review in page.object_list]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(scores[0], 5)
+
+
+class ProductBulkUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, cls.products = create_catalog(count=2)
+
+    def test_bulk_update_refreshes_card_key_and_caches(self):
+        product = self.products[0]
+        get_candidate_ids(self.category.id)
+        home_version = get_cache_version(HOME_SNAPSHOT_CACHE_VERSION)
+
+        Product.objects.filter(pk=product.pk).update(status=Product.Status.DRAFT)
+
+        # updated_at بخشی از کلید کش کارت محصول است
+        self.assertGreater(Product.objects.get(pk=product.pk).updated_at, product.updated_at)
+        self.assertNotIn(product.id, get_candidate_ids(self.category.id))
+        self.assertGreater(get_cache_version(HOME_SNAPSHOT_CACHE_VERSION), home_version)
+
+    def test_counter_update_keeps_updated_at(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(wishlist_count=3)
+        self.assertEqual(Product.objects.get(pk=product.pk).updated_at, product.updated_at)
+
+
+class AutocompleteIndexTests(TestCase):
+    def test_node_cap_rejects_new_entries(self):
+        index = autocomplete.AutocompleteIndex(max_nodes=6)
+        self.assertTrue(index.add(1, 'abc', 1, 'abc'))
+        self.assertFalse(index.add(2, 'xyz', 2, 'xyz'))
+        # مسیر مشترک گره جدیدی لازم ندارد
+        self.assertTrue(index.add(3, 'ab', 3, 'ab'))
+        self.assertEqual(index.suggest('a'), ['ab', 'abc'])
+
+    def test_remove_frees_nodes(self):
+        index = autocomplete.AutocompleteIndex()
+        index.add(1, 'abc', 1, 'abc')
+        index.add(2, 'abd', 1, 'abd')
+        index.remove(2)
+        self.assertEqual(index.stats()['nodes'], 4)
+        self.assertEqual(index.suggest('ab'), ['abc'])
+
+    def test_update_changes_weight_without_gaps(self):
+        index = autocomplete.AutocompleteIndex(top_k=2)
+        for key in range(3):
+            index.add(key, f'a{key}', key, key)
+        index.add(0, 'a0', 5, 'updated')
+        self.assertEqual(index.suggest('a'), ['updated', 2])
+        self.assertEqual(index.gaps, 0)
+
+
+@mock.patch.object(autocomplete, 'BACKGROUND_BUILD', False)
+@mock.patch.object(autocomplete, 'SYNC_INTERVAL', 0)
+class AutocompleteSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category, (cls.product,) = create_catalog()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        state = dict(autocomplete._state, indexes=None)
+        patcher = mock.patch.dict(autocomplete._state, state)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def suggested_names(self, query):
+        return [payload['name'] for payload in autocomplete.suggest(query)[0]]
+
+    def test_changes_from_other_processes_are_replayed(self):
+        self.assertEqual(self.suggested_names('a0'), [self.product.name])
+        indexes = autocomplete._state['indexes']
+
+        # ذخیره در پروسه‌ای دیگر (بدون ایندکس در حافظه)؛ فقط لاگ مشترک نوشته می‌شود
+        with mock.patch.dict(autocomplete._state, {'indexes': None}):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.model_name = 'B0'
+                self.product.save()
+
+        with mock.patch.object(autocomplete, 'build_indexes') as build_indexes:
+            self.assertEqual(self.suggested_names('a0'), [])
+            self.assertEqual(self.suggested_names('b0'), [self.product.name])
+        build_indexes.assert_not_called()
+        self.assertIs(autocomplete._state['indexes'], indexes)
+
+    def test_rolled_back_change_is_not_published(self):
+        autocomplete.suggest('a0')
+        seq = autocomplete._state['seq']
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.product.delete()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(get_cache_version(autocomplete.CACHE_VERSION_NAME), seq)
+        self.assertEqual(self.suggested_names('a0'), [self.product.name])
+
+    def test_unreachable_cache_is_logged_on_build_start(self):
+        with mock.patch.object(autocomplete, 'get_cache_version', side_effect=ConnectionError), \
+                self.assertLogs('products.autocomplete', 'ERROR'):
+            self.assertFalse(autocomplete.start_build())
+        self.assertIsNone(autocomplete._state['building'])
@@ -14,6 +14,7 @@ urlpatterns = [
     path('compare/remove/<int:product_id>/', views.remove_from_compare, name='remove_from_compare'),
 
     path('wishlist/toggle/<str:slug>/', views.toggle_wishlist, name='toggle_wishlist'),
+    path('reviews/list/<str:slug>/', views.product_reviews, name='product_reviews'),
     path('reviews/add/<str:slug>/', views.add_review, name='add_review'),
     path('reviews/like/<int:review_id>/', views.like_review, name='like_review'),
     path('reviews/dislike/<int:review_id>/', views.dislike_review, name='dislike_review'),
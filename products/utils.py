@@ -0,0 +1,74 @@
+import re
+from decimal import Decimal, InvalidOperation
+from django.utils.html import strip_tags
+
+# ارقام فارسی و عربی + ممیز فارسی (٫) -> ارقام لاتین
+DIGITS_TRANSLATION = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٫', '01234567890123456789.')
+
+NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def to_english_digits(text):
+    return str(text).translate(DIGITS_TRANSLATION)
+
+
+def parse_number(value):
+    """
+    استخراج اولین عدد از یک مقدار متنی
+    مثال: "8GB" -> 8 ، "۶٫۵ اینچ" -> 6.5 ، "بدون باتری" -> None
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    match = NUMBER_PATTERN.search(to_english_digits(value).replace(',', ''))
+    if not match:
+        return None
+    try:
+        return Decimal(match.group())
+    except InvalidOperation:
+        return None
+
+
+def format_number(value):
+    """نمایش Decimal بدون صفرهای اضافه (8.0000 -> 8 ، 6.5000 -> 6.5)"""
+    if value == value.to_integral_value():
+        return int(value)
+    return value.normalize()
+
+
+# یکسان‌سازی حروف عربی با فارسی (ي/ى -> ی ، ك -> ک ، ة/ۀ -> ه ، أ/إ/ٱ -> ا ، ؤ -> و)
+ARABIC_TO_PERSIAN_TRANSLATION = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ',  # نیم‌فاصله (ZWNJ)
+    '\u200f': None, '\u200e': None,  # علامت‌های جهت متن
+    '\u0640': None,  # کشیده (ـ)
+})
+
+# اعراب و تنوین
+DIACRITICS_PATTERN = re.compile('[\u064B-\u065F\u0670]')
+
+
+def normalize_persian(text):
+    """
+    نرمال‌سازی متن فارسی برای جستجو (هم هنگام ساخت ایندکس و هم هنگام جستجو)
+    ی/ک عربی، نیم‌فاصله، اعراب، ارقام فارسی/عربی و حروف بزرگ لاتین یکسان می‌شوند.
+    """
+    if not text:
+        return ''
+    text = to_english_digits(str(text)).translate(ARABIC_TO_PERSIAN_TRANSLATION)
+    text = DIACRITICS_PATTERN.sub('', text)
+    return ' '.join(text.lower().split())
+
+
+def build_search_title(product):
+    """متن نرمال‌شده عنوان محصول (نام + برند + مدل) برای ایندکس trigram"""
+    parts = [product.name, product.brand.name if product.brand else '', product.model_name]
+    return normalize_persian(' '.join(part for part in parts if part))
+
+
+def build_search_body(product):
+    """متن نرمال‌شده توضیحات محصول (بدون تگ‌های HTML)"""
+    return normalize_persian(strip_tags(product.description or ''))
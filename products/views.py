@@ -1,8 +1,18 @@
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import get_object_or_404, render, redirect
-from .models import ProductAttribute, Category, Product, Brand, AttributeGroup, Review
+from .models import ProductAttribute, Category, Product, Brand, AttributeGroup, Review, ReviewVote
 from .forms import ReviewForm
+from .facets import get_facet_sidebar, get_numeric_ranges
+from .filters import apply_spec_filters, apply_range_filters
+from .pagination import paginate_keyset
+from .search import search_products
+from .category_tree import find_category, find_category_by_slug, get_category_tree
+from .related import get_related_products
+from .schema import get_category_schema
+from .counters import with_pending
+from .votes import toggle_vote, attach_user_votes
+from .compare import get_comparison, get_compare_list, get_compare_scope, save_compare_list
 from django.contrib import messages
 from django.db.models import Count, Q
 from django.template.loader import render_to_string
@@ -11,98 +21,97 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 
 
+PRODUCTS_PER_PAGE = 24
+
+# ترتیب‌های قابل انتخاب در لیست محصولات (همه به id ختم می‌شوند تا کرسر یکتا باشد)
+PRODUCT_LIST_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'cheapest': ('price', 'id'),
+    'expensive': ('-price', '-id'),
+}
+
+REVIEWS_PER_PAGE = 10
+
+# ترتیب‌های لیست نظرات صفحه محصول (متناظر با ایندکس‌های مدل Review)
+REVIEW_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'helpful': ('-likes_count', '-created_at', '-id'),
+    'highest': ('-score', '-created_at', '-id'),
+    'lowest': ('score', '-created_at', '-id'),
+}
+
+
 # --- API مربوط به پنل ادمین ---
 @staff_member_required
 def get_category_attributes(request, category_id):
-    current_category = get_object_or_404(Category, id=category_id)
-    category_family = current_category.get_ancestors(include_self=True)
-    groups = AttributeGroup.objects.filter(
-        category__in=category_family
-    ).prefetch_related('attributes').order_by('category__level', 'order')
-
-    data = []
-    for group in groups:
-        attributes = group.attributes.all().values('key', 'label')
-        if attributes:
-            data.append({
-                'group_name': group.name,
-                'attributes': list(attributes)
-            })
-    return JsonResponse({'groups': data})
+    if find_category(category_id) is None:
+        raise Http404
+    return JsonResponse({'groups': get_category_schema(category_id).as_api()})
 
 
 # --- لیست محصولات ---
 def product_list(request):
-    products = Product.objects.filter(status=Product.Status.PUBLISHED)
+    products = Product.objects.filter(status=Product.Status.PUBLISHED).select_related('category')
     filterable_specs = []
+    numeric_ranges = []
+    text_attributes = []
     current_category = None
     category_slug = request.GET.get('category')
 
     if category_slug:
-        current_category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category__in=current_category.get_descendants(include_self=True))
-
-        category_family_ids = current_category.get_ancestors(include_self=True).values_list('id', flat=True)
-
-        attributes = ProductAttribute.objects.filter(
-            group__category_id__in=category_family_ids,
-            is_filterable=True
-        )
-
-        for attr in attributes:
-            spec_key = attr.key
-
-            raw_values = products.values_list(f'specifications__{spec_key}', flat=True)
-
-            # استفاده از set برای حذف تکراری‌های واقعی
-            clean_values_set = set()
-
-            for val in raw_values:
-                if val:
-                    # تبدیل به رشته و حذف فاصله‌های اول و آخر
-                    clean_val = str(val).strip()
-                    if clean_val:
-                        clean_values_set.add(clean_val)
-
-            if clean_values_set:
-                filterable_specs.append({
-                    'key': spec_key,
-                    'label': attr.label,
-                    'values': sorted(list(clean_values_set))
-                })
+        current_category = find_category_by_slug(category_slug)
+        if current_category is None:
+            raise Http404
+        category_tree = get_category_tree().descendant_ids(current_category.id)
+        products = products.filter(category_id__in=category_tree)
+
+        # ویژگی‌های عددی فیلتر بازه‌ای دارند و بقیه فیلتر چندانتخابی
+        numeric_attributes = []
+        for attr in get_category_schema(current_category.id).filterable_attributes:
+            if attr.value_type == ProductAttribute.ValueType.NUMBER:
+                numeric_attributes.append(attr)
+            else:
+                text_attributes.append(attr)
+        numeric_ranges = get_numeric_ranges(numeric_attributes, category_tree, request.GET)
 
     brands_slugs = request.GET.getlist('brand')
     if brands_slugs:
         products = products.filter(brand__slug__in=brands_slugs)
 
-    search_query = request.GET.get('q')
+    search_query = request.GET.get('q', '').strip()
     if search_query:
-        products = products.filter(name__icontains=search_query)
+        products = search_products(products, search_query)
 
     if request.GET.get('available') == '1':
         products = products.filter(stock__gt=0)
 
-    for param in request.GET:
-        if param.startswith('spec_'):
-            clean_key = param.replace('spec_', '')
-            selected_values = request.GET.getlist(param)
-            if selected_values:
-                filter_kwargs = {f"specifications__{clean_key}__in": selected_values}
-                products = products.filter(**filter_kwargs)
+    products = apply_range_filters(products, numeric_ranges)
+
+    # مقادیر فیلترها و تعداد هر مقدار (با فیلترهای فعلی) از ایندکس خوانده می‌شود
+    if current_category:
+        filterable_specs = get_facet_sidebar(text_attributes, category_tree, products, request.GET)
+    products = apply_spec_filters(products, request.GET)
 
     sort_by = request.GET.get('sort')
-    if sort_by == 'cheapest':
-        products = products.order_by('price')
-    elif sort_by == 'expensive':
-        products = products.order_by('-price')
+    if sort_by in PRODUCT_LIST_ORDERINGS:
+        ordering = PRODUCT_LIST_ORDERINGS[sort_by]
+    elif search_query:
+        # در جستجو، پیش‌فرض مرتب‌سازی بر اساس میزان ارتباط است
+        ordering = ('-rank', '-id')
     else:
-        products = products.order_by('-created_at')
+        ordering = PRODUCT_LIST_ORDERINGS['newest']
+    page = paginate_keyset(products, ordering, request, per_page=PRODUCTS_PER_PAGE)
+
+    # اسکرول بی‌نهایت: صفحات بعدی فقط کارت‌ها را برمی‌گردانند
+    if request.htmx and not page.is_first:
+        return render(request, 'products/partials/product_list_page.html', {'page': page})
 
     context = {
-        'products': products,
+        'page': page,
         'brands': Brand.objects.all(),
         'current_category': current_category,
         'filterable_specs': filterable_specs,
+        'numeric_ranges': numeric_ranges,
     }
     return render(request, 'products/product_list.html', context)
 
@@ -111,63 +120,27 @@ def product_list(request):
 def product_detail(request, slug):
     product = get_object_or_404(
         Product.objects.select_related('vendor', 'category', 'brand')
-        .prefetch_related('images', 'reviews__user'),
+        .prefetch_related('images'),
         slug=slug,
         status=Product.Status.PUBLISHED
     )
 
-    category_family = product.category.get_ancestors(include_self=True)
-
-    main_attrs = ProductAttribute.objects.filter(
-        group__category__in=category_family,
-        is_main=True
-    ).order_by('group__order', 'order')
-
-    summary_specs = []
-    for attr in main_attrs:
-        value = product.specifications.get(attr.key)
-        if value:
-            summary_specs.append({
-                'label': attr.label,
-                'value': value
-            })
-
-    summary_specs = summary_specs[:6]
-
-
-    attribute_groups = AttributeGroup.objects.filter(category__in=category_family).prefetch_related('attributes')
-
-    specs_display = []
-    for group in attribute_groups:
-        group_specs = []
-        for attr in group.attributes.all():
-            value = product.specifications.get(attr.key)
-            if value:
-                group_specs.append({'label': attr.label, 'value': value})
-        if group_specs:
-            specs_display.append({'name': group.name, 'items': group_specs})
-
-    reviews = product.reviews.all()
-    avg_rating = 0
-    if reviews.exists():
-        avg_rating = sum(r.score for r in reviews) / reviews.count()
+    # مشخصات اصلی و جدول مشخصات از ساختار کش‌شده ویژگی‌های دسته
+    schema = get_category_schema(product.category_id)
+    summary_specs = schema.summary_specs(product.specifications)
+    specs_display = schema.specs_display(product.specifications)
 
     # فرم نظرات
     form = ReviewForm()
 
     # === محصولات مرتبط ===
-    related_products = Product.objects.filter(
-        category=product.category,  # هم‌دسته
-        status=Product.Status.PUBLISHED,  # منتشر شده
-        is_available=True
-    ).exclude(id=product.id).order_by('?')[:10]  # خود محصول رو حذف کن، رندوم ۱۰ تا بیار
+    # نمونه تصادفی ۱۰ تایی از لیست کاندیدهای کش‌شده هم‌دسته
+    related_products = get_related_products(product, limit=10)
 
     context = {
         'product': product,
         'specs_display': specs_display,
         'summary_specs': summary_specs,
-        'reviews': reviews,
-        'avg_rating': round(avg_rating, 1),
         'range_5': range(1, 6),
         'form': form,
         'related_products': related_products,
@@ -186,88 +159,38 @@ def amazing_offers(request):
         is_available=True,
         stock__gt=0,
         discount_price__isnull=False  # فقط تخفیف‌دارها
-    ).order_by(
-        '-is_special',   # اول اونایی که ادمین ویژه کرده
-        '-created_at'    # بعد جدیدترین‌ها
     )
 
+    # اول اونایی که ادمین ویژه کرده، بعد جدیدترین‌ها
+    page = paginate_keyset(products, ('-is_special', '-created_at', '-id'), request, per_page=PRODUCTS_PER_PAGE)
+
+    if request.htmx and not page.is_first:
+        return render(request, 'products/partials/amazing_offers_page.html', {'page': page})
+
     context = {
-        'products': products
+        'page': page
     }
     return render(request, 'products/amazing_offers.html', context)
 
 
 # 1. تابع کمکی برای رندر کردن جدول
 def render_compare_table(request):
-    compare_list = request.session.get('compare_list', [])
-    products = Product.objects.filter(id__in=compare_list)
-
-    context = {'products': products}
-
-    if products.exists():
-        reference_category = products.first().category
-        category_family = reference_category.get_ancestors(include_self=True)
-        groups = AttributeGroup.objects.filter(category__in=category_family).prefetch_related('attributes').order_by(
-            'category__level', 'order')
-
-        comparison_data = []
-        for group in groups:
-            group_attrs = []
-            for attr in group.attributes.all():
-                row = {'label': attr.label, 'values': []}
-                has_value = False
-                for product in products:
-                    val = product.specifications.get(attr.key, '-')
-                    row['values'].append(val)
-                    if val != '-': has_value = True
-                if has_value: group_attrs.append(row)
-            if group_attrs: comparison_data.append({'group_name': group.name, 'attributes': group_attrs})
-
-        context['comparison_data'] = comparison_data
-
     # اگر درخواست HTMX بود، فقط پارشیال جدول رو برگردون
-    return render(request, 'products/partials/compare_table.html', context)
+    comparison = get_comparison(get_compare_list(request))
+    return render(request, 'products/partials/compare_table.html', comparison)
 
 
 # 2. ویوی اصلی صفحه مقایسه
 def compare_products(request):
-    # برای بار اول که صفحه باز میشه، کل قالب رو میفرستیم
-    # اما دیتای جدول رو با همون تابع کمکی میسازیم
-    response = render_compare_table(request)
-
-    compare_list = request.session.get('compare_list', [])
-    products = Product.objects.filter(id__in=compare_list)
-
-    # لاجیک ساخت comparison_data
-    comparison_data = []
-    if products.exists():
-        reference_category = products.first().category
-        category_family = reference_category.get_ancestors(include_self=True)
-        groups = AttributeGroup.objects.filter(category__in=category_family).prefetch_related('attributes')
-
-        for group in groups:
-            group_attrs = []
-            for attr in group.attributes.all():
-                row = {'label': attr.label, 'values': []}
-                has_value = False
-                for product in products:
-                    val = product.specifications.get(attr.key, '-')
-                    row['values'].append(val)
-                    if val != '-': has_value = True
-                if has_value: group_attrs.append(row)
-            if group_attrs: comparison_data.append({'group_name': group.name, 'attributes': group_attrs})
-
-    context = {
-        'products': products,
-        'comparison_data': comparison_data
-    }
-    return render(request, 'products/compare.html', context)
+    # کل قالب با همان ماتریس کش‌شده‌ای که پارشیال جدول استفاده می‌کند
+    comparison = get_comparison(get_compare_list(request))
+    return render(request, 'products/compare.html', comparison)
 
 
 # 3. افزودن به مقایسه
 def add_to_compare(request, product_id):
     product = get_object_or_404(Product, id=product_id)
-    compare_list = request.session.get('compare_list', [])
+    compare_list = get_compare_list(request)
 
     msg_text = ""
 
@@ -275,26 +198,14 @@ def add_to_compare(request, product_id):
 
     # --- لاجیک بررسی و افزودن ---
     if product_id not in compare_list:
-        is_compatible = False
-        if not compare_list:
-            is_compatible = True
-        else:
-            first_product = Product.objects.get(id=compare_list[0])
-            if product.category == first_product.category:
-                is_compatible = True
-            else:
-                cat1_ancestors = product.category.get_ancestors(include_self=True)
-                cat2_ancestors = first_product.category.get_ancestors(include_self=True)
-                common_ancestors = set(cat1_ancestors) & set(cat2_ancestors)
-                for ancestor in common_ancestors:
-                    if ancestor.is_comparison_root:
-                        is_compatible = True
-                        break
+        # هم‌دسته بودن یا داشتن جد مشترک با تیک مقایسه = محدوده مقایسه یکسان (بدون کوئری)
+        product_scope = get_category_tree().comparison_scope(product.category_id)
+        is_compatible = not compare_list or product_scope == get_compare_scope(request, compare_list)
 
         if is_compatible:
             if len(compare_list) < 4:
                 compare_list.append(product_id)
-                request.session['compare_list'] = compare_list
+                save_compare_list(request, compare_list, product_scope)
                 # استفاده از نام کوتاه در پیام موفقیت
                 msg_text = f"{short_name} به لیست مقایسه اضافه شد."
             else:
@@ -321,10 +232,11 @@ def add_to_compare(request, product_id):
 
 
 def remove_from_compare(request, product_id):
-    compare_list = request.session.get('compare_list', [])
+    compare_list = get_compare_list(request)
     if product_id in compare_list:
+        scope = get_compare_scope(request, compare_list)
         compare_list.remove(product_id)
-        request.session['compare_list'] = compare_list
+        save_compare_list(request, compare_list, scope)
 
     if request.htmx:
         # وقتی حذف میکنیم، هم جدول باید آپدیت شه، هم بج بالای صفحه
@@ -346,32 +258,18 @@ def search_for_compare(request):
     if not query or len(query) < 2:
         return HttpResponse('')
 
-    compare_list = request.session.get('compare_list', [])
-
-    products = Product.objects.filter(name__icontains=query, status=Product.Status.PUBLISHED)
-
-    # اگر لیستی وجود دارد، باید فقط محصولات هم‌دسته را بیاوریم
-    if compare_list:
-        first_product = Product.objects.get(id=compare_list[0])
-        # پیدا کردن دسته‌های مجاز (خود دسته + اجدادی که تیک root دارن)
-        valid_categories = [first_product.category]
-        ancestors = first_product.category.get_ancestors(include_self=True)
+    compare_list = get_compare_list(request)
 
-        # اگر یکی از اجداد root باشه، تمام زیرمجموعه‌های اون جد مجازن
-        root_category = None
-        for anc in ancestors:
-            if anc.is_comparison_root:
-                root_category = anc
-                break
+    products = search_products(Product.objects.filter(status=Product.Status.PUBLISHED), query)
 
-        if root_category:
-            products = products.filter(category__in=root_category.get_descendants(include_self=True))
-        else:
-            # اگر هیچ ریشه‌ای تعریف نشده، فقط دقیقا همون دسته رو بیار
-            products = products.filter(category=first_product.category)
+    # اگر لیستی وجود دارد، باید فقط محصولات هم‌محدوده را بیاوریم
+    # اگر ریشه مقایسه داشته باشد تمام زیرمجموعه‌هایش مجازند، وگرنه فقط دقیقا همان دسته
+    scope = get_compare_scope(request, compare_list)
+    if scope is not None:
+        products = products.filter(category_id__in=get_category_tree().comparable_category_ids(scope))
 
     # حذف محصولاتی که الان تو لیست هستن
-    products = products.exclude(id__in=compare_list)[:5]
+    products = products.exclude(id__in=compare_list).order_by('-rank', '-id')[:5]
 
     return render(request, 'products/partials/compare_search_results.html', {'products': products})
 
@@ -382,12 +280,36 @@ def search_for_compare(request):
 @require_POST
 def toggle_wishlist(request, slug):
     product = get_object_or_404(Product, slug=slug)
+    # تصمیم افزودن/حذف از خود دیتابیس (کش فقط برای نمایش است و ممکن است عقب باشد)؛
+    # بعد از add/remove سیگنال m2m_changed کش علاقه‌مندی‌های کاربر را باطل می‌کند
     if product.wishlist.filter(id=request.user.id).exists():
         product.wishlist.remove(request.user)
+        is_wishlisted = False
     else:
         product.wishlist.add(request.user)
+        is_wishlisted = True
+
+    # دکمه کوچک روی کارت‌های لیست محصولات
+    if request.GET.get('compact'):
+        return render(request, 'products/cards/wishlist_toggle.html', {'product': product, 'is_wishlisted': is_wishlisted})
     return render(request, 'core/includes/wishlist_button.html', {'product': product})
 
+def product_reviews(request, slug):
+    """
+    لیست نظرات صفحه محصول (HTMX) به صورت صفحه‌بندی کرسری
+    صفحه محصول بدون نظرات رندر می‌شود و این ویو آن‌ها را تکه‌تکه بارگذاری می‌کند.
+    """
+    product = get_object_or_404(Product.objects.only('id', 'slug'), slug=slug, status=Product.Status.PUBLISHED)
+    ordering = REVIEW_ORDERINGS.get(request.GET.get('sort'), REVIEW_ORDERINGS['newest'])
+    page = paginate_keyset(
+        Review.objects.filter(product_id=product.id).select_related('user'),
+        ordering, request, per_page=REVIEWS_PER_PAGE,
+    )
+    # شمارنده لایک‌ها همراه تغییرات هنوز flush نشده و رأی کاربر برای همه نظرات صفحه با یک کوئری
+    with_pending(page.object_list, *Review.COUNTER_FIELDS)
+    attach_user_votes(page.object_list, request.user)
+    return render(request, 'core/includes/review_list_page.html', {'page': page, 'product': product})
+
 @login_required
 @require_POST
 def add_review(request, slug):
@@ -398,32 +320,30 @@ def add_review(request, slug):
         review.product = product
         review.user = request.user
         review.save()
+        # آمار امتیاز در سیگنال با F-expression بروز شده؛ مقدار جدید خوانده می‌شود
+        product.refresh_from_db(fields=Product.COUNTER_FIELDS)
+        # فقط نظر جدید (out-of-band) به بالای لیست اضافه می‌شود، نه رندر دوباره کل لیست
         context = {
             'product': product,
-            'reviews': product.reviews.all(),
+            'review': review,
             'form': ReviewForm()
         }
-        return render(request, 'core/includes/review_section.html', context)
+        return render(request, 'core/includes/review_created.html', context)
     return HttpResponse("Error in form", status=400)
 
+def _vote_review(request, review_id, value):
+    review = get_object_or_404(Review, id=review_id)
+    # ثبت یا برداشتن رأی با یک کوئری (بدون خواندن لیست رأی‌دهندگان)
+    review.user_vote = toggle_vote(review.id, request.user.id, value)
+    with_pending([review], *Review.COUNTER_FIELDS)
+    return render(request, 'core/includes/review_actions.html', {'review': review})
+
 @login_required
 @require_POST
 def like_review(request, review_id):
-    review = get_object_or_404(Review, id=review_id)
-    if request.user in review.likes.all():
-        review.likes.remove(request.user)
-    else:
-        review.likes.add(request.user)
-        review.dislikes.remove(request.user)
-    return render(request, 'core/includes/review_actions.html', {'review': review})
+    return _vote_review(request, review_id, ReviewVote.Value.LIKE)
 
 @login_required
 @require_POST
 def dislike_review(request, review_id):
-    review = get_object_or_404(Review, id=review_id)
-    if request.user in review.dislikes.all():
-        review.dislikes.remove(request.user)
-    else:
-        review.dislikes.add(request.user)
-        review.likes.remove(request.user)
-    return render(request, 'core/includes/review_actions.html', {'review': review})
\ No newline at end of file
+    return _vote_review(request, review_id, ReviewVote.Value.DISLIKE)
\ No newline at end of file
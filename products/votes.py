@@ -0,0 +1,73 @@
+from django.db import connection
+from .models import Review, ReviewVote
+from .counters import increment
+
+COUNTER_BY_VALUE = {
+    ReviewVote.Value.LIKE: 'likes_count',
+    ReviewVote.Value.DISLIKE: 'dislikes_count',
+}
+
+# یک رفت‌وبرگشت برای هر کلیک:
+# رأی هم‌مقدار قبلی حذف می‌شود (برداشتن لایک)، وگرنه رأی درج یا به مقدار جدید تغییر می‌کند.
+# شرط WHERE در ON CONFLICT باعث می‌شود کلیک همزمان با همان مقدار چیزی را عوض نکند
+# و xmax = 0 ردیف تازه درج‌شده را از ردیف تغییر‌یافته جدا می‌کند.
+TOGGLE_VOTE_SQL = """
+WITH previous AS (
+    SELECT id, value FROM products_reviewvote
+    WHERE review_id = %(review_id)s AND user_id = %(user_id)s
+),
+removed AS (
+    DELETE FROM products_reviewvote
+    WHERE id IN (SELECT id FROM previous WHERE value = %(value)s)
+    RETURNING value
+),
+upserted AS (
+    INSERT INTO products_reviewvote (review_id, user_id, value, created_at)
+    SELECT %(review_id)s, %(user_id)s, %(value)s, now()
+    WHERE NOT EXISTS (SELECT 1 FROM previous WHERE value = %(value)s)
+    ON CONFLICT (review_id, user_id) DO UPDATE SET value = EXCLUDED.value
+    WHERE products_reviewvote.value <> EXCLUDED.value
+    RETURNING value, (xmax = 0) AS inserted
+)
+SELECT
+    (SELECT value FROM removed),
+    (SELECT value FROM upserted),
+    (SELECT inserted FROM upserted),
+    (SELECT value FROM previous)
+"""
+
+
+def toggle_vote(review_id, user_id, value):
+    """
+    ثبت/برداشتن رأی کاربر روی یک نظر با یک کوئری و بروزرسانی شمارنده‌های نظر
+    خروجی: رأی فعلی کاربر (LIKE، DISLIKE یا None)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(TOGGLE_VOTE_SQL, {'review_id': review_id, 'user_id': user_id, 'value': value})
+        removed, upserted, inserted, previous = cursor.fetchone()
+
+    if removed is not None:
+        increment(Review, COUNTER_BY_VALUE[removed], review_id, -1)
+        return None
+    if upserted is not None:
+        increment(Review, COUNTER_BY_VALUE[upserted], review_id, 1)
+        if not inserted:
+            increment(Review, COUNTER_BY_VALUE[-upserted], review_id, -1)
+        return upserted
+    # رأی همزمان با همین مقدار ثبت شده بود، یا رأی قبلی را درخواست دیگری همزمان حذف کرد
+    return value if previous != value else None
+
+
+def attach_user_votes(reviews, user):
+    """
+    رأی کاربر جاری برای همه نظرات صفحه با یک کوئری (review.user_vote)
+    خروجی لیست همان نظرات است.
+    """
+    reviews = list(reviews)
+    if reviews and user.is_authenticated:
+        votes = dict(ReviewVote.objects.filter(
+            user=user, review_id__in=[review.id for review in reviews],
+        ).values_list('review_id', 'value'))
+        for review in reviews:
+            review.user_vote = votes.get(review.id)
+    return reviews
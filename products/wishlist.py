@@ -0,0 +1,27 @@
+from django.core.cache import cache
+
+WISHLIST_TIMEOUT = 60 * 60 * 24
+
+
+def _wishlist_key(user_id):
+    return f'wishlist_ids:{user_id}'
+
+
+def get_wishlist_ids(user):
+    """
+    مجموعه شناسه محصولات علاقه‌مندی کاربر (کش‌شده)
+    وضعیت "علاقه‌مندی" هر تعداد کارت یا صفحه محصول با همین یک مجموعه مشخص می‌شود،
+    بدون خواندن لیست کاربران product.wishlist.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = _wishlist_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(user.wishlist.values_list('id', flat=True))
+        cache.set(key, ids, WISHLIST_TIMEOUT)
+    return ids
+
+
+def invalidate_wishlist(user_ids):
+    cache.delete_many([_wishlist_key(user_id) for user_id in user_ids])
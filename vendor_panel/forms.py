@@ -1,5 +1,6 @@
 from django import forms
-from products.models import Product
+from products.models import Product, Category
+from products.forms import CategoryChoiceField
 
 
 
@@ -9,6 +10,11 @@ class MultipleFileInput(forms.ClearableFileInput):
 
 
 class ProductForm(forms.ModelForm):
+    category = CategoryChoiceField(
+        queryset=Category.objects.all(),
+        label='دسته بندی',
+        widget=forms.Select(attrs={'class': 'w-full p-2 border rounded-lg'})
+    )
     gallery_images = forms.FileField(
         widget=MultipleFileInput(attrs={'class': 'w-full p-2 border rounded-lg'}),
         required=False,
@@ -28,7 +34,6 @@ class ProductForm(forms.ModelForm):
             'price': forms.NumberInput(attrs={'class': 'w-full p-2 border rounded-lg'}),
             'discount_price': forms.NumberInput(attrs={'class': 'w-full p-2 border rounded-lg'}),
             'stock': forms.NumberInput(attrs={'class': 'w-full p-2 border rounded-lg'}),
-            'category': forms.Select(attrs={'class': 'w-full p-2 border rounded-lg'}),
             'brand': forms.Select(attrs={'class': 'w-full p-2 border rounded-lg'}),
             'specifications': forms.HiddenInput(),
         }
\ No newline at end of file